@@ -2,31 +2,65 @@ __all__ = [
     "Pan123",
     "core",
     "exception",
+    "hooks",
     "log",
     "models",
+    "utils",
     "file",
     "offline",
     "share",
     "user",
+    "transfer",
+    "telemetry",
 ]
 
 from types import TracebackType
 from httpx import AsyncClient
 
-from . import core, exception, log, models, file, offline, share, user
+from . import core, exception, hooks, log, models, utils, file, offline, share, user
+from . import transfer, telemetry
 
 
 class Pan123:
     def __init__(
-        self, client_id: str, client_secret: str, client: AsyncClient | None = None
+        self,
+        client_id: str,
+        client_secret: str,
+        client: AsyncClient | None = None,
+        upload_concurrency: int = 4,
+        upload_journal: file.journal.UploadJournal | None = None,
+        download_connections: int = 4,
+        upload_complete_timeout: float = 600,
+        hash_cache: file.hashcache.HashCache | None = None,
+        hooks: list[hooks.RequestHook] | None = None,
+        scheduler: core.RequestScheduler | None = None,
+        api_pool: core.PoolConfig = core.DEFAULT_API_POOL,
+        upload_pool: core.PoolConfig = core.DEFAULT_UPLOAD_POOL,
+        download_pool: core.PoolConfig = core.DEFAULT_DOWNLOAD_POOL,
+        transfers: transfer.TransferScheduler | None = None,
+        listeners: list[telemetry.TransferListener] | None = None,
     ):
         self._client: core.Client = core.Client(
             client_id=client_id,
             client_secret=client_secret,
             client=client,
+            hooks=hooks,
+            scheduler=scheduler,
+            api_pool=api_pool,
+            upload_pool=upload_pool,
+            download_pool=download_pool,
         )
         self.user: user.User = user.User(client=self._client)
-        self.files: file.File = file.File(client=self._client)
+        self.files: file.File = file.File(
+            client=self._client,
+            upload_concurrency=upload_concurrency,
+            upload_journal=upload_journal,
+            download_connections=download_connections,
+            upload_complete_timeout=upload_complete_timeout,
+            hash_cache=hash_cache,
+            transfers=transfers,
+            listeners=listeners,
+        )
         self.offline: offline.Offline = offline.Offline(client=self._client)
         self.share: share.Share = share.Share(client=self._client)
 
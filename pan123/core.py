@@ -1,18 +1,203 @@
-__all__ = ["Client"]
+__all__ = [
+    "TokenBucket",
+    "RetryPolicy",
+    "RequestScheduler",
+    "PoolConfig",
+    "Client",
+]
 
+import os
+from logging import DEBUG
 from ssl import PROTOCOL_TLS_CLIENT
-from datetime import datetime, UTC
-from typing import cast
+from time import monotonic, perf_counter
+from asyncio import Lock, Task, create_task, shield, sleep
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, UTC
+from random import uniform
+from collections.abc import Callable
+from functools import partial
+from typing import Literal, TypeVar, cast
 
-from httpx import AsyncClient, Response
+from httpx import (
+    AsyncClient,
+    ConnectError,
+    ConnectTimeout,
+    HTTPStatusError,
+    Limits,
+    PoolTimeout,
+    Request,
+    Response,
+    Timeout,
+    TransportError,
+)
 from httpx._types import QueryParamTypes, RequestData, RequestFiles
+from pydantic_core import from_json
 from truststore import SSLContext
 
+from .hooks import RequestEndEvent, RequestHook, RequestStartEvent
 from .log import logger
-from .models import DataT, APIReturn, AccessTokenData
+from .models import DataT, APIReturn, AccessTokenData, BaseData
 from .exception import ClientException
+from .utils import FileLock
 
 HEADERS = {"Platform": "open_platform"}
+Pool = Literal["api", "upload", "download"]
+LOG_BODY_LIMIT = 1024
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RATE_LIMITED = 429
+UNSENT_ERRORS = (ConnectError, ConnectTimeout, PoolTimeout)
+RETRYABLE_ERRORS: tuple[type[Exception], ...] = (
+    HTTPStatusError,
+    ClientException,
+    TransportError,
+)
+API_RETURNS: dict[type, type] = {}
+
+T = TypeVar("T")
+
+
+def _preview_body(body: bytes) -> str:
+    if len(body) <= LOG_BODY_LIMIT:
+        return repr(body)
+    return f"{body[:LOG_BODY_LIMIT]!r}... ({len(body)} bytes)"
+
+
+def _request_size(request: Request) -> int:
+    length = cast(str, request.headers.get("Content-Length", ""))
+    return int(length) if length.isdigit() else 0
+
+
+def _api_return(model: type[DataT]) -> type[APIReturn[DataT]]:
+    api_return = API_RETURNS.get(model)
+    if api_return is None:
+        api_return = API_RETURNS[model] = APIReturn[model]
+    return cast(type[APIReturn[DataT]], api_return)
+
+
+def _decode(model: type[DataT], response: Response) -> tuple[DataT, str | None]:
+    ret = _api_return(model).model_validate_json(response.content)
+    if ret.code != 0:
+        raise ClientException[DataT](response.request, ret)
+    return cast(DataT, ret.data), ret.xTraceID
+
+
+def _decode_lean(
+    model: type[DataT], response: Response
+) -> tuple[dict[str, object], str | None]:
+    payload = cast(dict[str, object], from_json(response.content))
+    if payload["code"] != 0:
+        ret = _api_return(model).model_validate(payload | {"data": None})
+        raise ClientException[DataT](response.request, ret)
+    return cast(dict[str, object], payload["data"]), cast(
+        str | None, payload.get("x-traceID")
+    )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate: float = rate
+        self.burst: int = burst
+        self._tokens: float = burst
+        self._updated: float = monotonic()
+        self._lock: Lock = Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass(slots=True)
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    statuses: set[int] = field(default_factory=lambda: {429, 500, 502, 503, 504})
+    codes: set[int] = field(default_factory=lambda: {429})
+    retry_transport_errors: bool = True
+
+    def should_retry(
+        self, error: Exception, attempt: int, idempotent: bool = True
+    ) -> bool:
+        if attempt + 1 >= self.max_attempts:
+            return False
+        if isinstance(error, HTTPStatusError):
+            status = error.response.status_code
+            return status in self.statuses and (idempotent or status == RATE_LIMITED)
+        if isinstance(error, ClientException):
+            code = cast(ClientException[BaseData | None], error).response.code
+            return code in self.codes and (idempotent or code == RATE_LIMITED)
+        return (
+            self.retry_transport_errors
+            and isinstance(error, TransportError)
+            and (idempotent or isinstance(error, UNSENT_ERRORS))
+        )
+
+    def delay(self, error: Exception, attempt: int) -> float:
+        if isinstance(error, HTTPStatusError):
+            retry_after = cast(str, error.response.headers.get("Retry-After", ""))
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_delay)
+        return uniform(0, min(self.max_delay, self.base_delay * 2.0**attempt))
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        rate_limits: dict[str, tuple[float, int]] | None = None,
+        default_rate_limit: tuple[float, int] | None = None,
+        retry: RetryPolicy | None = None,
+    ):
+        self.rate_limits: dict[str, tuple[float, int]] = rate_limits or {}
+        self.default_rate_limit: tuple[float, int] | None = default_rate_limit
+        self.retry: RetryPolicy = retry or RetryPolicy()
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def bucket(self, endpoint: str) -> TokenBucket | None:
+        bucket = self._buckets.get(endpoint)
+        if bucket is not None:
+            return bucket
+        rate_limit = self.rate_limits.get(endpoint, self.default_rate_limit)
+        if rate_limit is None:
+            return None
+        bucket = self._buckets[endpoint] = TokenBucket(*rate_limit)
+        return bucket
+
+
+@dataclass(slots=True, frozen=True)
+class PoolConfig:
+    max_connections: int | None = 100
+    max_keepalive_connections: int | None = 20
+    keepalive_expiry: float | None = 5.0
+    timeout: float | None = 5.0
+    http2: bool = False
+
+    def build(self) -> AsyncClient:
+        return AsyncClient(
+            verify=SSLContext(PROTOCOL_TLS_CLIENT),
+            limits=Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=Timeout(self.timeout),
+            http2=self.http2,
+        )
+
+
+DEFAULT_REFRESH_AHEAD = timedelta(minutes=10)
+DEFAULT_API_POOL = PoolConfig()
+DEFAULT_UPLOAD_POOL = PoolConfig(max_connections=32, timeout=60.0)
+DEFAULT_DOWNLOAD_POOL = PoolConfig(max_connections=32, timeout=60.0)
 
 
 class Client:
@@ -22,17 +207,34 @@ class Client:
         client_secret: str,
         client: AsyncClient | None = None,
         storage_file: str | None = "access_token.json",
+        refresh_ahead: timedelta = DEFAULT_REFRESH_AHEAD,
+        hooks: list[RequestHook] | None = None,
+        scheduler: RequestScheduler | None = None,
+        api_pool: PoolConfig = DEFAULT_API_POOL,
+        upload_pool: PoolConfig = DEFAULT_UPLOAD_POOL,
+        download_pool: PoolConfig = DEFAULT_DOWNLOAD_POOL,
     ):
         self.base_url: str = "https://open-api.123pan.com"
         self.client_id: str = client_id
         self.client_secret: str = client_secret
-        self._client: AsyncClient = client or AsyncClient(
-            verify=SSLContext(PROTOCOL_TLS_CLIENT)
+        self._clients: dict[Pool, AsyncClient] = (
+            {"api": client, "upload": client, "download": client}
+            if client is not None
+            else {
+                "api": api_pool.build(),
+                "upload": upload_pool.build(),
+                "download": download_pool.build(),
+            }
         )
         self._hold_client: bool = client is None
         self.storage_file: str | None = storage_file
         self._access_token: str = ""
         self._access_token_expires: datetime = datetime.min.replace(tzinfo=UTC)
+        self.refresh_ahead: timedelta = refresh_ahead
+        self._refresh_task: Task[None] | None = None
+        self._refresh_timer: Task[None] | None = None
+        self.hooks: list[RequestHook] = hooks or []
+        self.scheduler: RequestScheduler = scheduler or RequestScheduler()
 
     async def request_raw(
         self,
@@ -45,6 +247,7 @@ class Client:
         use_access_token: bool = True,
         no_platform_header: bool = False,
         base_url: str | None = None,
+        pool: Pool = "api",
     ) -> Response:
         headers = HEADERS.copy()
         if base_url is None:
@@ -54,7 +257,7 @@ class Client:
         if no_platform_header:
             _ = headers.pop("Platform", None)
 
-        response = await self._client.request(
+        response = await self._clients[pool].request(
             method=method,
             url=f"{base_url}{endpoint}",
             headers=headers,
@@ -64,10 +267,12 @@ class Client:
             files=files,
         )
 
-        request = response.request
-        logger.debug(
-            f"REQUEST BODY = {request.read()}\n" + f"RESPONSE BODY = {response.read()}"
-        )
+        if logger.isEnabledFor(DEBUG):
+            logger.debug(
+                "REQUEST BODY = %s\nRESPONSE BODY = %s",
+                _preview_body(response.request.read()),
+                _preview_body(response.read()),
+            )
 
         return response.raise_for_status()
 
@@ -83,10 +288,46 @@ class Client:
         use_access_token: bool = True,
         no_platform_header: bool = False,
         base_url: str | None = None,
+        pool: Pool = "api",
+        retry: RetryPolicy | None = None,
+        idempotent: bool | None = None,
     ) -> DataT:
-        response = await self.request_raw(
+        return await self._request(
+            method=method,
+            endpoint=endpoint,
+            decode=partial(_decode, model),
+            params=params,
+            json=json,
+            data=data,
+            files=files,
+            use_access_token=use_access_token,
+            no_platform_header=no_platform_header,
+            base_url=base_url,
+            pool=pool,
+            retry=retry,
+            idempotent=idempotent,
+        )
+
+    async def request_lean(
+        self,
+        method: str,
+        endpoint: str,
+        model: type[DataT],
+        params: QueryParamTypes | None = None,
+        json: object = None,
+        data: RequestData | None = None,
+        files: RequestFiles | None = None,
+        use_access_token: bool = True,
+        no_platform_header: bool = False,
+        base_url: str | None = None,
+        pool: Pool = "api",
+        retry: RetryPolicy | None = None,
+        idempotent: bool | None = None,
+    ) -> dict[str, object]:
+        return await self._request(
             method=method,
             endpoint=endpoint,
+            decode=partial(_decode_lean, model),
             params=params,
             json=json,
             data=data,
@@ -94,47 +335,212 @@ class Client:
             use_access_token=use_access_token,
             no_platform_header=no_platform_header,
             base_url=base_url,
+            pool=pool,
+            retry=retry,
+            idempotent=idempotent,
         )
 
-        ret = APIReturn[model].model_validate_json(response.content)
-        if ret.code != 0:
-            raise ClientException[model](response.request, ret)
-        return cast(DataT, ret.data)
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        decode: Callable[[Response], tuple[T, str | None]],
+        params: QueryParamTypes | None = None,
+        json: object = None,
+        data: RequestData | None = None,
+        files: RequestFiles | None = None,
+        use_access_token: bool = True,
+        no_platform_header: bool = False,
+        base_url: str | None = None,
+        pool: Pool = "api",
+        retry: RetryPolicy | None = None,
+        idempotent: bool | None = None,
+    ) -> T:
+        retry = retry or self.scheduler.retry
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        bucket = self.scheduler.bucket(endpoint)
+        attempt = 0
+        while True:
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                return await self._request_once(
+                    method=method,
+                    endpoint=endpoint,
+                    decode=decode,
+                    params=params,
+                    json=json,
+                    data=data,
+                    files=files,
+                    use_access_token=use_access_token,
+                    no_platform_header=no_platform_header,
+                    base_url=base_url,
+                    pool=pool,
+                )
+            except RETRYABLE_ERRORS as e:
+                if not retry.should_retry(e, attempt, idempotent):
+                    raise
+                delay = retry.delay(e, attempt)
+                logger.info(f"Retrying {endpoint} in {delay:.2f}s after: {e}")
+                await sleep(delay)
+                attempt += 1
 
-    def get_client(self) -> AsyncClient:
-        return self._client
+    async def _request_once(
+        self,
+        method: str,
+        endpoint: str,
+        decode: Callable[[Response], tuple[T, str | None]],
+        params: QueryParamTypes | None = None,
+        json: object = None,
+        data: RequestData | None = None,
+        files: RequestFiles | None = None,
+        use_access_token: bool = True,
+        no_platform_header: bool = False,
+        base_url: str | None = None,
+        pool: Pool = "api",
+    ) -> T:
+        base_url = base_url or self.base_url
+        if self.hooks:
+            self._emit_start(RequestStartEvent(method, endpoint, base_url))
+        started = perf_counter()
+        response: Response | None = None
+        trace_id: str | None = None
+        error: BaseException | None = None
+        try:
+            response = await self.request_raw(
+                method=method,
+                endpoint=endpoint,
+                params=params,
+                json=json,
+                data=data,
+                files=files,
+                use_access_token=use_access_token,
+                no_platform_header=no_platform_header,
+                base_url=base_url,
+                pool=pool,
+            )
+            result, trace_id = decode(response)
+            return result
+        except HTTPStatusError as e:
+            response, error = e.response, e
+            raise
+        except BaseException as e:
+            error = e
+            if isinstance(e, ClientException):
+                trace_id = cast(ClientException[BaseData | None], e).response.xTraceID
+            raise
+        finally:
+            if self.hooks:
+                self._emit_end(
+                    RequestEndEvent(
+                        method=method,
+                        endpoint=endpoint,
+                        base_url=base_url,
+                        status=None if response is None else response.status_code,
+                        bytes_sent=(
+                            0 if response is None else _request_size(response.request)
+                        ),
+                        bytes_received=(
+                            0 if response is None else len(response.content)
+                        ),
+                        latency=perf_counter() - started,
+                        trace_id=trace_id,
+                        error=error,
+                    )
+                )
+
+    def _emit_start(self, event: RequestStartEvent) -> None:
+        for hook in self.hooks:
+            try:
+                hook.on_request_start(event)
+            except Exception:
+                logger.exception(f"{hook!r} failed on request start")
+
+    def _emit_end(self, event: RequestEndEvent) -> None:
+        for hook in self.hooks:
+            try:
+                hook.on_request_end(event)
+            except Exception:
+                logger.exception(f"{hook!r} failed on request end")
+
+    def get_client(self, pool: Pool = "api") -> AsyncClient:
+        return self._clients[pool]
 
     def _is_access_token_valid(self) -> bool:
         return self._access_token_expires.astimezone(UTC) > datetime.now(UTC)
 
-    def _load_access_token(self) -> bool:
-        if self._is_access_token_valid():
-            return True
+    def _needs_refresh(self) -> bool:
+        return self._access_token_expires.astimezone(UTC) - self.refresh_ahead <= (
+            datetime.now(UTC)
+        )
+
+    def _read_access_token(self) -> bool:
         if self.storage_file is None:
             return False
         try:
             with open(self.storage_file, "r") as f:
                 data = AccessTokenData.model_validate_json(f.read())
-            self._access_token = data.accessToken
-            self._access_token_expires = data.expiredAt
-            return self._is_access_token_valid()
         except FileNotFoundError:
-            pass
-        return False
+            return False
+        if data.expiredAt <= self._access_token_expires:
+            return False
+        self._access_token = data.accessToken
+        self._access_token_expires = data.expiredAt
+        return True
+
+    def _load_access_token(self) -> bool:
+        if self._is_access_token_valid():
+            return True
+        _ = self._read_access_token()
+        return self._is_access_token_valid()
 
     def _save_access_token(self, data: AccessTokenData) -> None:
         self._access_token = data.accessToken
         self._access_token_expires = data.expiredAt
         if self.storage_file is None:
             return
-        with open(self.storage_file, "w") as f:
+        tmp_file = f"{self.storage_file}.tmp"
+        with open(tmp_file, "w") as f:
             _ = f.write(data.model_dump_json())
+        os.replace(tmp_file, self.storage_file)
 
     async def _get_access_token(self) -> str:
         if not self._load_access_token():
-            await self._update_access_token()
+            await self._refresh_access_token()
+        if self._refresh_timer is None or self._refresh_timer.done():
+            self._refresh_timer = create_task(self._refresh_ahead_loop())
         return self._access_token
 
+    async def _refresh_access_token(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = create_task(self._refresh_access_token_locked())
+        await shield(self._refresh_task)
+
+    async def _refresh_access_token_locked(self) -> None:
+        lock = (
+            nullcontext()
+            if self.storage_file is None
+            else FileLock(f"{self.storage_file}.lock")
+        )
+        async with lock:
+            if self._read_access_token() and not self._needs_refresh():
+                return
+            await self._update_access_token()
+
+    async def _refresh_ahead_loop(self) -> None:
+        while True:
+            expires = self._access_token_expires.astimezone(UTC)
+            now = datetime.now(UTC)
+            delay = expires - self.refresh_ahead - now
+            if delay <= timedelta(0):
+                delay = (expires - now) / 2
+            await sleep(max(delay.total_seconds(), 1))
+            try:
+                await self._refresh_access_token()
+            except Exception as e:
+                logger.warning(f"Refreshing access token ahead of expiry failed: {e}")
+
     async def _update_access_token(self) -> None:
         data = await self.request(
             method="POST",
@@ -145,9 +551,13 @@ class Client:
                 "clientSecret": self.client_secret,
             },
             use_access_token=False,
+            idempotent=True,
         )
         self._save_access_token(data)
 
     async def aclose(self) -> None:
+        if self._refresh_timer is not None:
+            _ = self._refresh_timer.cancel()
         if self._hold_client:
-            await self._client.aclose()
+            for client in self._clients.values():
+                await client.aclose()
@@ -0,0 +1,476 @@
+__all__ = ["EmulatorConfig", "Emulator"]
+
+import re
+from asyncio import sleep, to_thread
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, UTC
+from hashlib import md5
+from itertools import count
+from json import dumps, loads
+from random import Random
+from time import monotonic
+from typing import NotRequired, TypedDict, cast
+
+from httpx import AsyncBaseTransport, AsyncByteStream, Request, Response
+from typing_extensions import override
+
+from .transfer import ByteBucket
+
+API_HOST = "open-api.123pan.com"
+DOWNLOAD_HOST = "download.emulator"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(slots=True)
+class EmulatorConfig:
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: float | None = None
+    link_bandwidth: float | None = None
+    rate_limits: dict[str, float] = field(default_factory=dict)
+    faults: dict[str, float] = field(default_factory=dict)
+    slice_size: int = 16 * 1024 * 1024
+    servers: list[str] = field(
+        default_factory=lambda: [
+            "https://upload-1.emulator",
+            "https://upload-2.emulator",
+        ]
+    )
+    complete_polls: int = 1
+    token_lifetime: timedelta = timedelta(days=30)
+    seed: int | None = None
+
+
+class _MkdirBody(TypedDict):
+    name: str
+    parentID: int
+
+
+class _CreateBody(TypedDict):
+    parentFileID: int
+    filename: str
+    etag: str
+    size: int
+    duplicate: NotRequired[int]
+    containDir: NotRequired[bool]
+
+
+class _CompleteBody(TypedDict):
+    preuploadID: str
+
+
+class _InfosBody(TypedDict):
+    fileIds: list[int]
+
+
+class _TrashBody(TypedDict):
+    fileIDs: list[int]
+
+
+@dataclass(slots=True)
+class _Entry:
+    fileId: int
+    filename: str
+    parentFileId: int
+    type: int
+    etag: str = ""
+    size: int = 0
+    trashed: bool = False
+    data: bytes = b""
+    createAt: datetime = field(default_factory=lambda: datetime.now(UTC))
+    updateAt: datetime = field(default_factory=lambda: datetime.now(UTC))
+
+    def basic(self) -> dict[str, object]:
+        return {
+            "fileId": self.fileId,
+            "filename": self.filename,
+            "parentFileId": self.parentFileId,
+            "type": self.type,
+            "etag": self.etag,
+            "size": self.size,
+            "category": 0,
+            "status": 0,
+            "trashed": int(self.trashed),
+        }
+
+    def info(self) -> dict[str, object]:
+        return self.basic() | {
+            "punishFlag": 0,
+            "s3KeyFlag": "",
+            "storageNode": "emulator",
+            "createAt": self.createAt.isoformat(),
+            "updateAt": self.updateAt.isoformat(),
+        }
+
+
+@dataclass(slots=True)
+class _Upload:
+    parent_id: int
+    filename: str
+    etag: str
+    size: int
+    cover: bool
+    slices: dict[int, bytes] = field(default_factory=dict)
+    polls: int = 0
+
+
+class _Limiter:
+    def __init__(self, rate: float):
+        self.rate: float = rate
+        self._tokens: float = max(rate, 1)
+        self._updated: float = monotonic()
+
+    def allow(self) -> bool:
+        now = monotonic()
+        self._tokens = min(
+            max(self.rate, 1), self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class _PacedStream(AsyncByteStream):
+    def __init__(self, throttle: Callable[[int], Awaitable[None]], data: bytes):
+        self._throttle: Callable[[int], Awaitable[None]] = throttle
+        self._data: bytes = data
+
+    @override
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for start in range(0, len(self._data), STREAM_CHUNK_SIZE):
+            chunk = self._data[start : start + STREAM_CHUNK_SIZE]
+            await self._throttle(len(chunk))
+            await sleep(0)
+            yield chunk
+
+
+def _multipart(request: Request, body: bytes) -> dict[str, bytes]:
+    boundary = request.headers["Content-Type"].split("boundary=", 1)[1].encode()
+    fields: dict[str, bytes] = {}
+    for part in body.split(b"--" + boundary)[1:-1]:
+        headers, _, value = part.partition(b"\r\n\r\n")
+        name = re.search(rb'name="([^"]*)"', headers)
+        if name is not None:
+            fields[name.group(1).decode()] = value[:-2]
+    return fields
+
+
+class Emulator(AsyncBaseTransport):
+    def __init__(self, config: EmulatorConfig | None = None):
+        self.config: EmulatorConfig = config or EmulatorConfig()
+        self.files: dict[int, _Entry] = {}
+        self.requests: Counter[str] = Counter()
+        self._ids: count[int] = count(1)
+        self._uploads: dict[str, _Upload] = {}
+        self._tokens: dict[str, datetime] = {}
+        self._random: Random = Random(self.config.seed)
+        self._limiters: dict[str, _Limiter] = {
+            endpoint: _Limiter(rate)
+            for endpoint, rate in self.config.rate_limits.items()
+        }
+        self._link: ByteBucket | None = (
+            None
+            if self.config.link_bandwidth is None
+            else ByteBucket(self.config.link_bandwidth)
+        )
+        self._routes: dict[str, Callable[[Request, bytes], Awaitable[Response]]] = {
+            "/api/v1/access_token": self._access_token,
+            "/upload/v1/file/mkdir": self._mkdir,
+            "/upload/v2/file/create": self._create,
+            "/upload/v2/file/slice": self._slice,
+            "/upload/v2/file/upload_complete": self._upload_complete,
+            "/api/v2/file/list": self._list,
+            "/api/v1/file/infos": self._infos,
+            "/api/v1/file/trash": self._trash,
+            "/api/v1/file/download_info": self._download_info,
+            "download": self._download,
+        }
+
+    def add_dir(self, name: str, parent_id: int = 0) -> int:
+        entry = _Entry(next(self._ids), name, parent_id, 1)
+        self.files[entry.fileId] = entry
+        return entry.fileId
+
+    def add_file(
+        self, name: str, data: bytes, parent_id: int = 0, etag: str | None = None
+    ) -> int:
+        entry = _Entry(
+            fileId=next(self._ids),
+            filename=name,
+            parentFileId=parent_id,
+            type=0,
+            etag=etag or md5(data).hexdigest(),
+            size=len(data),
+            data=data,
+        )
+        self.files[entry.fileId] = entry
+        return entry.fileId
+
+    @override
+    async def handle_async_request(self, request: Request) -> Response:
+        route = (
+            "download"
+            if request.url.path.startswith("/download/")
+            else request.url.path
+        )
+        handler = self._routes.get(route)
+        if handler is None:
+            return Response(404, request=request)
+        self.requests[route] += 1
+        if self.config.latency or self.config.jitter:
+            await sleep(
+                self.config.latency + self._random.uniform(0, self.config.jitter)
+            )
+        if self._random.random() < self.config.faults.get(route, 0):
+            return Response(503, request=request)
+        limiter = self._limiters.get(route)
+        if limiter is not None and not limiter.allow():
+            return self._error(request, 429, "操作频繁，请稍后再试")
+        if route not in ("/api/v1/access_token", "download") and (
+            self._tokens.get(
+                cast(str, request.headers.get("Authorization", "")).removeprefix(
+                    "Bearer "
+                )
+            )
+            or datetime.min.replace(tzinfo=UTC)
+        ) < datetime.now(UTC):
+            return self._error(request, 401, "access_token无效")
+        if not isinstance(request.stream, AsyncByteStream):
+            raise TypeError("Emulator needs an async request stream")
+        chunks: list[bytes] = []
+        async for chunk in request.stream:
+            await self._throttle(len(chunk))
+            await sleep(0)
+            chunks.append(chunk)
+        body = chunks[0] if len(chunks) == 1 else await to_thread(b"".join, chunks)
+        return await handler(request, body)
+
+    async def _throttle(self, size: int) -> None:
+        if self._link is not None:
+            await self._link.acquire(size)
+        if self.config.bandwidth is not None:
+            await sleep(size / self.config.bandwidth)
+
+    def _reply(self, request: Request, data: object) -> Response:
+        return self._json(request, 0, "ok", data)
+
+    def _error(self, request: Request, code: int, message: str) -> Response:
+        return self._json(request, code, message, None)
+
+    def _json(
+        self, request: Request, code: int, message: str, data: object
+    ) -> Response:
+        return Response(
+            200,
+            request=request,
+            headers={"Content-Type": "application/json"},
+            content=dumps(
+                {
+                    "code": code,
+                    "message": message,
+                    "data": data,
+                    "x-traceID": f"{self._random.getrandbits(64):016x}",
+                }
+            ).encode(),
+        )
+
+    def _child(self, parent_id: int, name: str) -> _Entry | None:
+        for entry in self.files.values():
+            if (
+                entry.parentFileId == parent_id
+                and entry.filename == name
+                and not entry.trashed
+            ):
+                return entry
+        return None
+
+    async def _access_token(self, request: Request, _body: bytes) -> Response:
+        token = f"{self._random.getrandbits(128):032x}"
+        expires = datetime.now(UTC) + self.config.token_lifetime
+        self._tokens[token] = expires
+        return self._reply(
+            request, {"accessToken": token, "expiredAt": expires.isoformat()}
+        )
+
+    async def _mkdir(self, request: Request, body: bytes) -> Response:
+        payload = cast(_MkdirBody, loads(body))
+        if self._child(payload["parentID"], payload["name"]) is not None:
+            return self._error(request, 1, "该目录下已经有同名文件夹,无法进行创建")
+        return self._reply(
+            request, {"dirID": self.add_dir(payload["name"], payload["parentID"])}
+        )
+
+    async def _create(self, request: Request, body: bytes) -> Response:
+        payload = cast(_CreateBody, loads(body))
+        parent_id = payload["parentFileID"]
+        *dir_names, filename = payload["filename"].split("/")
+        if dir_names and not payload.get("containDir"):
+            return self._error(request, 1, "文件名不能包含/")
+        for name in dir_names:
+            child = self._child(parent_id, name)
+            parent_id = child.fileId if child else self.add_dir(name, parent_id)
+        upload = _Upload(
+            parent_id=parent_id,
+            filename=filename,
+            etag=payload["etag"].lower(),
+            size=payload["size"],
+            cover=payload.get("duplicate") == 2,
+        )
+        for entry in self.files.values():
+            if entry.etag == upload.etag and entry.size == upload.size:
+                file_id = self._finish(upload, entry.data)
+                return self._reply(
+                    request,
+                    {
+                        "fileID": file_id,
+                        "preuploadID": "",
+                        "reuse": True,
+                        "sliceSize": 0,
+                        "servers": [],
+                    },
+                )
+        preupload_id = f"{self._random.getrandbits(128):032x}"
+        self._uploads[preupload_id] = upload
+        return self._reply(
+            request,
+            {
+                "fileID": 0,
+                "preuploadID": preupload_id,
+                "reuse": False,
+                "sliceSize": self.config.slice_size,
+                "servers": self.config.servers,
+            },
+        )
+
+    async def _slice(self, request: Request, body: bytes) -> Response:
+        fields = await to_thread(_multipart, request, body)
+        upload = self._uploads.get(fields["preuploadID"].decode())
+        if upload is None:
+            return self._error(request, 1, "预上传ID不存在")
+        slice_md5 = await to_thread(lambda: md5(fields["slice"]).hexdigest())
+        if slice_md5 != fields["sliceMD5"].decode().lower():
+            return self._error(request, 1, "分片MD5校验失败")
+        upload.slices[int(fields["sliceNo"])] = fields["slice"]
+        return self._reply(request, None)
+
+    async def _upload_complete(self, request: Request, body: bytes) -> Response:
+        preupload_id = cast(_CompleteBody, loads(body))["preuploadID"]
+        upload = self._uploads.get(preupload_id)
+        if upload is None:
+            return self._error(request, 1, "预上传ID不存在")
+        upload.polls += 1
+        if upload.polls <= self.config.complete_polls:
+            return self._reply(request, {"completed": False, "fileID": 0})
+        data = await to_thread(
+            b"".join, [upload.slices[idx] for idx in sorted(upload.slices)]
+        )
+        if len(data) != upload.size or (
+            await to_thread(lambda: md5(data).hexdigest()) != upload.etag
+        ):
+            return self._error(request, 1, "文件MD5校验失败")
+        del self._uploads[preupload_id]
+        return self._reply(
+            request, {"completed": True, "fileID": self._finish(upload, data)}
+        )
+
+    def _finish(self, upload: _Upload, data: bytes) -> int:
+        existing = self._child(upload.parent_id, upload.filename)
+        if existing is not None and upload.cover:
+            existing.trashed = True
+        return self.add_file(upload.filename, data, upload.parent_id, upload.etag)
+
+    async def _list(self, request: Request, _body: bytes) -> Response:
+        params = request.url.params
+        limit = int(cast(str, params.get("limit", "100")))
+        last_id = int(params.get("lastFileId") or 0)
+        search = cast(str | None, params.get("searchData"))
+        if search:
+            entries = [
+                entry
+                for entry in self.files.values()
+                if (
+                    entry.filename == search
+                    if params.get("searchMode") == "1"
+                    else search in entry.filename
+                )
+            ]
+        else:
+            parent_id = int(cast(str, params.get("parentFileId", "0")))
+            entries = [
+                entry
+                for entry in self.files.values()
+                if entry.parentFileId == parent_id
+            ]
+        entries = sorted(
+            (entry for entry in entries if entry.fileId > last_id),
+            key=lambda entry: entry.fileId,
+        )
+        page = entries[:limit]
+        return self._reply(
+            request,
+            {
+                "lastFileId": page[-1].fileId if len(entries) > limit else -1,
+                "fileList": [entry.basic() for entry in page],
+            },
+        )
+
+    async def _infos(self, request: Request, body: bytes) -> Response:
+        return self._reply(
+            request,
+            {
+                "fileList": [
+                    self.files[file_id].info()
+                    for file_id in cast(_InfosBody, loads(body))["fileIds"]
+                    if file_id in self.files
+                ]
+            },
+        )
+
+    async def _trash(self, request: Request, body: bytes) -> Response:
+        for file_id in cast(_TrashBody, loads(body))["fileIDs"]:
+            if file_id in self.files:
+                self.files[file_id].trashed = True
+        return self._reply(request, None)
+
+    async def _download_info(self, request: Request, _body: bytes) -> Response:
+        file_id = int(request.url.params["fileID"])
+        entry = self.files.get(file_id)
+        if entry is None or entry.type:
+            return self._error(request, 1, "文件不存在")
+        return self._reply(
+            request,
+            {"downloadUrl": f"https://{DOWNLOAD_HOST}/download/{file_id}"},
+        )
+
+    async def _download(self, request: Request, _body: bytes) -> Response:
+        entry = self.files.get(int(request.url.path.rsplit("/", 1)[1]))
+        if entry is None or entry.type:
+            return Response(404, request=request)
+        data = entry.data
+        match = re.fullmatch(
+            r"bytes=(\d+)-(\d*)", cast(str, request.headers.get("Range", ""))
+        )
+        if match is None:
+            return Response(
+                200,
+                request=request,
+                headers={"Content-Length": str(len(data))},
+                stream=_PacedStream(self._throttle, data),
+            )
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+        if start >= len(data):
+            return Response(416, request=request)
+        return Response(
+            206,
+            request=request,
+            headers={
+                "Content-Length": str(end - start + 1),
+                "Content-Range": f"bytes {start}-{end}/{len(data)}",
+            },
+            stream=_PacedStream(self._throttle, data[start : end + 1]),
+        )
@@ -1,6 +1,7 @@
-__all__ = ["ClientException"]
+__all__ = ["ClientException", "TransferException", "BatchException"]
 
-from typing import Generic
+from collections.abc import Sequence
+from typing import Generic, TypeVar
 
 from httpx import Request
 
@@ -14,3 +15,20 @@ class ClientException(RuntimeError, Generic[DataT]):
         super().__init__(
             f"{self.request.url} failed with {self.response.code}: {self.response.message}"
         )
+
+
+class TransferException(RuntimeError): ...
+
+
+ResultT = TypeVar("ResultT")
+
+
+class BatchException(RuntimeError, Generic[ResultT]):
+    def __init__(
+        self, result: ResultT, errors: list[tuple[Sequence[object], Exception]]
+    ):
+        self.result: ResultT = result
+        self.errors: list[tuple[Sequence[object], Exception]] = errors
+        super().__init__(
+            f"{len(self.errors)} batches failed, first error: {self.errors[0][1]}"
+        )
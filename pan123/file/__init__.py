@@ -1,34 +1,145 @@
+import os
 from types import NoneType
+from typing import Literal, Never, TypeVar, cast, overload
 from hashlib import md5
-from random import choice
-from asyncio import sleep
+from time import perf_counter
+from urllib.parse import urlsplit
+from asyncio import Lock, Queue, create_task, sleep, to_thread
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
 
-from ..core import Client
-from ..exception import ClientException
+from httpx import HTTPStatusError, TransportError
+
+from ..core import RETRYABLE_ERRORS, Client, RetryPolicy
+from ..exception import BatchException, ClientException, TransferException
 from ..log import logger
-from . import models, enums
+from ..telemetry import TransferListener, TransferTracker
+from ..transfer import Direction, TransferPriority, TransferScheduler
+from ..utils import gather_or_cancel
+from . import models, enums, journal, partial, poller, report, index, cache
+from . import hashcache, dirs, sync, servers
+from .journal import UploadJournal, UploadJournalEntry
+from .partial import DownloadSidecar, PartDigest
+from .poller import CompletionPoller
+from .report import TransferResult
+from .cache import PathCache
+from .hashcache import HashCache
+from .dirs import RemoteDirs
+from .servers import UploadServers
 
 __all__ = [
     "enums",
     "models",
+    "journal",
+    "partial",
+    "poller",
+    "report",
+    "index",
+    "cache",
+    "hashcache",
+    "dirs",
+    "sync",
+    "servers",
     "File",
 ]
 
+DOWNLOAD_PART_SIZE = 8 * 1024 * 1024
+EXPIRED_URL_STATUSES = {401, 403, 404, 410}
+SLICE_RETRY = RetryPolicy(max_attempts=1)
+RESUME_ERRORS: tuple[type[Exception], ...] = (ClientException, TimeoutError)
+BATCH_SIZES = {
+    "/api/v1/file/rename": 30,
+    "/api/v1/file/trash": 100,
+    "/api/v1/file/async/copy": 100,
+    "/api/v1/file/recover": 100,
+    "/api/v1/file/recover/by_path": 100,
+    "/api/v1/file/infos": 100,
+    "/api/v1/file/move": 100,
+}
+
+T = TypeVar("T")
+R = TypeVar("R")
+M = TypeVar("M")
+WalkFilter = Callable[[str, models.FileBasicInfo | models.FileRecord], bool]
+
+
+def _read_slice(path: str, start: int, size: int) -> tuple[bytes, str]:
+    with open(path, "rb") as f:
+        _ = f.seek(start)
+        slice_data = f.read(size)
+    return slice_data, md5(slice_data).hexdigest()
+
+
+def _scan_tree(local_dir: str) -> tuple[list[str], list[str]]:
+    rel_dirs: list[str] = []
+    rel_files: list[str] = []
+    for root, _, filenames in os.walk(local_dir):
+        rel_root = os.path.relpath(root, local_dir).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root
+        rel_dirs.append(rel_root)
+        rel_files.extend(f"{rel_root}/{name}".lstrip("/") for name in filenames)
+    return rel_dirs, rel_files
+
+
+def _search_params(
+    dir_id: int,
+    limit: int,
+    search_data: str | None,
+    precised_search: bool | None,
+    first_id: int | None,
+) -> dict[str, str | int | None]:
+    return {
+        "parentFileId": dir_id,
+        "limit": limit,
+        "searchData": search_data,
+        "searchMode": int(precised_search) if precised_search is not None else None,
+        "lastFileId": first_id,
+    }
+
 
 class File:
-    def __init__(self, client: Client):
+    def __init__(
+        self,
+        client: Client,
+        upload_concurrency: int = 4,
+        upload_journal: UploadJournal | None = None,
+        download_connections: int = 4,
+        upload_complete_timeout: float = 600,
+        path_cache: PathCache | None = None,
+        batch_concurrency: int = 4,
+        hash_cache: HashCache | None = None,
+        transfers: TransferScheduler | None = None,
+        listeners: list[TransferListener] | None = None,
+        upload_servers: UploadServers | None = None,
+    ):
         self._client: Client = client
+        self.upload_concurrency: int = upload_concurrency
+        self.upload_journal: UploadJournal | None = upload_journal
+        self.download_connections: int = download_connections
+        self.upload_complete_timeout: float = upload_complete_timeout
+        self.path_cache: PathCache = path_cache or PathCache()
+        self.batch_sizes: dict[str, int] = BATCH_SIZES.copy()
+        self.batch_concurrency: int = batch_concurrency
+        self.hash_cache: HashCache | None = hash_cache
+        self.transfers: TransferScheduler = transfers or TransferScheduler()
+        self.listeners: list[TransferListener] = listeners or []
+        self.upload_servers: UploadServers = upload_servers or UploadServers()
+        self._completion_poller: CompletionPoller = CompletionPoller(
+            complete=self._upload_complete
+        )
 
     async def mkdir(self, name: str, parent_id: int = 0) -> models.MkdirData:
-        return await self._client.request(
-            method="POST",
-            endpoint="/upload/v1/file/mkdir",
-            model=models.MkdirData,
-            json={
-                "name": name,
-                "parentID": parent_id,
-            },
-        )
+        try:
+            return await self._client.request(
+                method="POST",
+                endpoint="/upload/v1/file/mkdir",
+                model=models.MkdirData,
+                json={
+                    "name": name,
+                    "parentID": parent_id,
+                },
+            )
+        finally:
+            self.path_cache.invalidate(parent_id, name)
 
     async def _create_file(
         self,
@@ -59,19 +170,89 @@ class File:
         preupload_id: str,
         slice_no: int,
         slice_data: bytes,
+        slice_md5: str | None = None,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        tracker: TransferTracker | None = None,
+        retry: RetryPolicy | None = None,
     ) -> None:
-        return await self._client.request(
-            method="POST",
-            base_url=base_url,
-            endpoint=f"/upload/v2/file/slice",
-            model=NoneType,
-            data={
-                "preuploadID": preupload_id,
-                "sliceNo": slice_no,
-                "sliceMD5": md5(slice_data).hexdigest(),
-            },
-            files={"slice": slice_data},
-        )
+        if slice_md5 is None:
+            slice_md5 = await to_thread(lambda: md5(slice_data).hexdigest())
+        await self.transfers.acquire("upload", len(slice_data), priority)
+        host = urlsplit(base_url).netloc
+        started = perf_counter()
+
+        try:
+            await self._client.request(
+                method="POST",
+                base_url=base_url,
+                pool="upload",
+                endpoint=f"/upload/v2/file/slice",
+                model=NoneType,
+                data={
+                    "preuploadID": preupload_id,
+                    "sliceNo": slice_no,
+                    "sliceMD5": slice_md5,
+                },
+                files={"slice": slice_data},
+                retry=retry,
+            )
+        except Exception as e:
+            if tracker is not None:
+                tracker.part(host, len(slice_data), perf_counter() - started, e)
+            raise
+        if tracker is not None:
+            tracker.part(host, len(slice_data), perf_counter() - started)
+            tracker.advance(len(slice_data))
+
+    async def _send_slice(
+        self,
+        servers: Sequence[str],
+        preupload_id: str,
+        slice_no: int,
+        slice_data: bytes,
+        slice_md5: str,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        tracker: TransferTracker | None = None,
+    ) -> None:
+        policy = self._client.scheduler.retry
+        tried: set[str] = set()
+        attempt = 0
+        while True:
+            server = self.upload_servers.pick(servers, tried)
+            started = perf_counter()
+            try:
+                await self._upload_slice(
+                    base_url=server,
+                    preupload_id=preupload_id,
+                    slice_no=slice_no,
+                    slice_data=slice_data,
+                    slice_md5=slice_md5,
+                    priority=priority,
+                    tracker=tracker,
+                    retry=SLICE_RETRY,
+                )
+            except RETRYABLE_ERRORS as e:
+                self.upload_servers.record(
+                    server, len(slice_data), perf_counter() - started, e
+                )
+                if not policy.should_retry(e, attempt):
+                    raise
+                tried.add(server)
+                if tried.issuperset(servers):
+                    tried.clear()
+                    await sleep(policy.delay(e, attempt))
+                logger.info(f"Slice {slice_no} failed on {server}, retrying: {e}")
+                if tracker is not None:
+                    tracker.retry()
+                attempt += 1
+                continue
+            except BaseException:
+                self.upload_servers.release(server)
+                raise
+            self.upload_servers.record(
+                server, len(slice_data), perf_counter() - started
+            )
+            return
 
     async def _upload_complete(
         self,
@@ -84,7 +265,86 @@ class File:
             json={
                 "preuploadID": preupload_id,
             },
+            idempotent=True,
+        )
+
+    def _tracker(
+        self,
+        direction: Direction,
+        path: str,
+        size: int,
+        progress: TransferListener | None = None,
+    ) -> TransferTracker | None:
+        listeners = self.listeners if progress is None else [*self.listeners, progress]
+        if not listeners:
+            return None
+        return TransferTracker(direction, path, size, listeners)
+
+    async def _hash_file(self, local_path: str, stat: os.stat_result) -> str:
+        if self.hash_cache is not None:
+            return await self.hash_cache.md5(local_path, stat)
+        return await to_thread(hashcache.file_md5, local_path)
+
+    async def _upload_slices(
+        self,
+        local_path: str,
+        file_size: int,
+        entry: UploadJournalEntry,
+        concurrency: int,
+        journal: UploadJournal | None = None,
+        journal_key: str = "",
+        complete_timeout: float | None = None,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        tracker: TransferTracker | None = None,
+    ) -> int:
+        if tracker is not None:
+            tracker.resume(
+                sum(
+                    min(entry.sliceSize, file_size - (idx - 1) * entry.sliceSize)
+                    for idx in entry.done
+                )
+            )
+        slices = (
+            (idx, start)
+            for idx, start in enumerate(range(0, file_size, entry.sliceSize), 1)
+            if idx not in entry.done
+        )
+        prepared: Queue[tuple[int, bytes, str] | None] = Queue(concurrency)
+
+        async def prepare() -> None:
+            for idx, start in slices:
+                slice_data, slice_md5 = await to_thread(
+                    _read_slice, local_path, start, entry.sliceSize
+                )
+                await prepared.put((idx, slice_data, slice_md5))
+            for _ in range(concurrency):
+                await prepared.put(None)
+
+        async def worker() -> None:
+            while (item := await prepared.get()) is not None:
+                idx, slice_data, slice_md5 = item
+                await self._send_slice(
+                    servers=entry.servers,
+                    preupload_id=entry.preuploadID,
+                    slice_no=idx,
+                    slice_data=slice_data,
+                    slice_md5=slice_md5,
+                    priority=priority,
+                    tracker=tracker,
+                )
+                entry.done.add(idx)
+                if journal is not None:
+                    journal.mark_done(journal_key, idx)
+
+        _ = await gather_or_cancel(prepare(), *(worker() for _ in range(concurrency)))
+        file_id = await self._completion_poller.wait(
+            entry.preuploadID, timeout=complete_timeout
         )
+        if journal is not None:
+            journal.discard(journal_key)
+        if tracker is not None:
+            tracker.finish()
+        return file_id
 
     async def upload(
         self,
@@ -92,60 +352,248 @@ class File:
         remote_path: str,
         parent_id: int = 0,
         do_cover: bool = False,
+        concurrency: int | None = None,
+        journal: UploadJournal | None = None,
+        complete_timeout: float | None = None,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        progress: TransferListener | None = None,
     ) -> int:
-        with open(local_path, "rb") as f:
-            file_data = f.read()
-        file_size = len(file_data)
+        concurrency = concurrency or self.upload_concurrency
+        if complete_timeout is None:
+            complete_timeout = self.upload_complete_timeout
+        journal = journal or self.upload_journal
+        stat = os.stat(local_path)
+        file_md5 = await self._hash_file(local_path, stat)
+        journal_key = UploadJournal.key(
+            local_path=local_path,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            md5=file_md5,
+            remote_path=remote_path,
+            parent_id=parent_id,
+        )
+        tracker = self._tracker("upload", local_path, stat.st_size, progress)
+
+        entry = journal.get(journal_key) if journal is not None else None
+        if entry is not None:
+            try:
+                return await self._upload_slices(
+                    local_path=local_path,
+                    file_size=stat.st_size,
+                    entry=entry,
+                    concurrency=concurrency,
+                    journal=journal,
+                    journal_key=journal_key,
+                    complete_timeout=complete_timeout,
+                    priority=priority,
+                    tracker=tracker,
+                )
+            except RESUME_ERRORS as e:
+                logger.warning(f"Cannot resume upload of {local_path}: {e}")
+                if journal is not None:
+                    journal.discard(journal_key)
+                tracker = self._tracker("upload", local_path, stat.st_size, progress)
+
         remote_file = await self._create_file(
             parent_id=parent_id,
             name=remote_path,
-            md5=md5(file_data).hexdigest(),
-            size=file_size,
+            md5=file_md5,
+            size=stat.st_size,
             do_cover=do_cover,
             contain_dir="/" in remote_path,
         )
+        if do_cover and "/" in remote_path:
+            self.path_cache.clear()
+        elif do_cover:
+            self.path_cache.invalidate(parent_id, remote_path)
         if remote_file.reuse:
+            if tracker is not None:
+                tracker.resume(stat.st_size)
+                tracker.finish()
             return remote_file.fileID
-        for idx, start in enumerate(range(0, file_size, remote_file.sliceSize), 1):
-            end = min(start + remote_file.sliceSize, file_size)
-            slice = file_data[start:end]
-            await self._upload_slice(
-                base_url=choice(remote_file.servers),
-                preupload_id=remote_file.preuploadID,
-                slice_no=idx,
-                slice_data=slice,
-            )
-        while True:
-            try:
-                complete = await self._upload_complete(
-                    preupload_id=remote_file.preuploadID,
-                )
-            except ClientException[models.UploadCompleteData] as e:
-                logger.error(e)
-                complete = e.response.data
-            if complete and complete.completed:
-                return complete.fileID
-            await sleep(1)
+        entry = UploadJournalEntry(
+            preuploadID=remote_file.preuploadID,
+            sliceSize=remote_file.sliceSize,
+            servers=remote_file.servers,
+        )
+        if journal is not None:
+            journal.put(journal_key, entry)
+        return await self._upload_slices(
+            local_path=local_path,
+            file_size=stat.st_size,
+            entry=entry,
+            concurrency=concurrency,
+            journal=journal,
+            journal_key=journal_key,
+            complete_timeout=complete_timeout,
+            priority=priority,
+            tracker=tracker,
+        )
 
-    async def rename(self, files: dict[int, str]) -> models.RenameData:
-        return await self._client.request(
-            method="POST",
-            endpoint="/api/v1/file/rename",
-            model=models.RenameData,
-            json={
-                "renameList": [f"{idx}|{name}" for idx, name in files.items()],
-            },
+    async def _lookup(self, name: str, parent_id: int) -> models.FileBasicInfo | None:
+        info = self.path_cache.get(parent_id, name)
+        if info is not None:
+            return info
+        page = await self.search(search_data=name, precised_search=True)
+        for info in page.fileList:
+            if (
+                not info.trashed
+                and info.parentFileId == parent_id
+                and info.filename == name
+            ):
+                self.path_cache.put(info)
+                return info
+        if page.lastFileId == -1:
+            return None
+        async for info in self.iter_list(parent_id):
+            if not info.trashed and info.filename == name:
+                self.path_cache.put(info)
+                return info
+        return None
+
+    async def stat(self, path: str, root_id: int = 0) -> models.FileBasicInfo:
+        info: models.FileBasicInfo | None = None
+        parent_id = root_id
+        for name in path.strip("/").split("/"):
+            if not name:
+                raise ValueError(f"{path!r} has no file info")
+            if info is not None and not info.type:
+                raise NotADirectoryError(path)
+            info = await self._lookup(name, parent_id)
+            if info is None:
+                raise FileNotFoundError(path)
+            parent_id = info.fileId
+        return cast(models.FileBasicInfo, info)
+
+    async def resolve(self, path: str, root_id: int = 0) -> int:
+        if not path.strip("/"):
+            return root_id
+        return (await self.stat(path, root_id)).fileId
+
+    async def mkdir_or_get(self, name: str, parent_id: int) -> int:
+        try:
+            return (await self.mkdir(name=name, parent_id=parent_id)).dirID
+        except ClientException:
+            info = await self._lookup(name, parent_id)
+            if info is None or not info.type:
+                raise
+            return info.fileId
+
+    async def upload_tree(
+        self,
+        local_dir: str,
+        remote_parent_id: int = 0,
+        concurrency: int = 8,
+        do_cover: bool = False,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        progress: TransferListener | None = None,
+    ) -> list[TransferResult]:
+        remote_dirs = RemoteDirs(
+            self.mkdir_or_get, remote_parent_id, concurrency=concurrency
         )
+        rel_dirs, rel_files = await to_thread(_scan_tree, local_dir)
+        pending = iter(rel_files)
+        pending_dirs = iter(rel_dirs)
+        results: list[TransferResult] = []
+
+        async def worker() -> None:
+            for rel_file in pending:
+                local_path = os.path.join(local_dir, *rel_file.split("/"))
+                rel_dir, _, name = rel_file.rpartition("/")
+                try:
+                    file_id = await self.upload(
+                        local_path=local_path,
+                        remote_path=name,
+                        parent_id=await remote_dirs.ensure(rel_dir),
+                        do_cover=do_cover,
+                        priority=priority,
+                        progress=progress,
+                    )
+                    results.append(TransferResult(local_path, rel_file, file_id))
+                except Exception as e:
+                    logger.warning(f"Uploading {local_path} failed: {e}")
+                    results.append(TransferResult(local_path, rel_file, None, e))
+            for rel_dir in pending_dirs:
+                try:
+                    _ = await remote_dirs.ensure(rel_dir)
+                except Exception:
+                    continue
+
+        _ = await gather_or_cancel(*(worker() for _ in range(concurrency)))
+        await remote_dirs.wait()
+        return results
+
+    async def _batched(
+        self,
+        endpoint: str,
+        items: Sequence[T],
+        send: Callable[[Sequence[T]], Awaitable[R]],
+        merge: Callable[[list[R]], M],
+    ) -> M:
+        batch_size = self.batch_sizes.get(endpoint, 0) or len(items) or 1
+        batches = [
+            items[i : i + batch_size] for i in range(0, len(items), batch_size)
+        ] or [items]
+        if len(batches) == 1:
+            return merge([await send(batches[0])])
+
+        pending = iter(enumerate(batches))
+        results: dict[int, R] = {}
+        errors: list[tuple[Sequence[object], Exception]] = []
+
+        async def worker() -> None:
+            for idx, batch in pending:
+                try:
+                    results[idx] = await send(batch)
+                except Exception as e:
+                    logger.warning(f"Batch {idx} of {endpoint} failed: {e}")
+                    errors.append((batch, e))
+
+        _ = await gather_or_cancel(*(worker() for _ in range(self.batch_concurrency)))
+        merged = merge([results[idx] for idx in sorted(results)])
+        if errors:
+            raise BatchException(merged, errors)
+        return merged
+
+    async def rename(self, files: dict[int, str]) -> models.RenameData:
+        try:
+            return await self._batched(
+                endpoint="/api/v1/file/rename",
+                items=list(files.items()),
+                send=lambda batch: self._client.request(
+                    method="POST",
+                    endpoint="/api/v1/file/rename",
+                    model=models.RenameData,
+                    json={
+                        "renameList": [f"{idx}|{name}" for idx, name in batch],
+                    },
+                ),
+                merge=lambda results: models.RenameData(
+                    successList=[item for r in results for item in r.successList],
+                    failList=[item for r in results for item in r.failList],
+                ),
+            )
+        finally:
+            self.path_cache.invalidate_ids(files)
 
     async def trash(self, file_ids: list[int]) -> None:
-        return await self._client.request(
-            method="POST",
-            endpoint="/api/v1/file/trash",
-            model=NoneType,
-            json={
-                "fileIDs": file_ids,
-            },
-        )
+        try:
+            return await self._batched(
+                endpoint="/api/v1/file/trash",
+                items=file_ids,
+                send=lambda batch: self._client.request(
+                    method="POST",
+                    endpoint="/api/v1/file/trash",
+                    model=NoneType,
+                    json={
+                        "fileIDs": batch,
+                    },
+                    idempotent=True,
+                ),
+                merge=lambda _: None,
+            )
+        finally:
+            self.path_cache.invalidate_ids(file_ids)
 
     async def copy(self, file_id: int, target_dir_id: int) -> models.CopyData:
         return await self._client.request(
@@ -171,6 +619,16 @@ class File:
             },
         )
 
+    async def copy_async_batches(
+        self, file_ids: list[int], target_dir_id: int
+    ) -> list[models.CopyAsyncData]:
+        return await self._batched(
+            endpoint="/api/v1/file/async/copy",
+            items=file_ids,
+            send=lambda batch: self.copy_async(list(batch), target_dir_id),
+            merge=lambda results: results,
+        )
+
     async def copy_progress(self, task_id: int) -> models.CopyProgressData:
         return await self._client.request(
             method="GET",
@@ -182,34 +640,62 @@ class File:
         )
 
     async def recover(self, file_ids: list[int]) -> models.RecoverData:
-        return await self._client.request(
-            method="POST",
-            endpoint="/api/v1/file/recover",
-            model=models.RecoverData,
-            json={
-                "fileIDs": file_ids,
-            },
-        )
+        try:
+            return await self._batched(
+                endpoint="/api/v1/file/recover",
+                items=file_ids,
+                send=lambda batch: self._client.request(
+                    method="POST",
+                    endpoint="/api/v1/file/recover",
+                    model=models.RecoverData,
+                    json={
+                        "fileIDs": batch,
+                    },
+                    idempotent=True,
+                ),
+                merge=lambda results: models.RecoverData(
+                    abnormalFileIDs=[i for r in results for i in r.abnormalFileIDs]
+                ),
+            )
+        finally:
+            self.path_cache.invalidate_ids(file_ids)
 
     async def recover_by_path(self, file_ids: list[int], target_dir_id: int) -> None:
-        return await self._client.request(
-            method="POST",
-            endpoint="/api/v1/file/recover/by_path",
-            model=NoneType,
-            json={
-                "fileIDs": file_ids,
-                "parentFileID": target_dir_id,
-            },
-        )
+        try:
+            return await self._batched(
+                endpoint="/api/v1/file/recover/by_path",
+                items=file_ids,
+                send=lambda batch: self._client.request(
+                    method="POST",
+                    endpoint="/api/v1/file/recover/by_path",
+                    model=NoneType,
+                    json={
+                        "fileIDs": batch,
+                        "parentFileID": target_dir_id,
+                    },
+                    idempotent=True,
+                ),
+                merge=lambda _: None,
+            )
+        finally:
+            self.path_cache.invalidate_ids(file_ids)
 
     async def infos(self, file_ids: list[int]) -> models.FileInfosData:
-        return await self._client.request(
-            method="POST",
+        return await self._batched(
             endpoint="/api/v1/file/infos",
-            model=models.FileInfosData,
-            json={
-                "fileIds": file_ids,
-            },
+            items=file_ids,
+            send=lambda batch: self._client.request(
+                method="POST",
+                endpoint="/api/v1/file/infos",
+                model=models.FileInfosData,
+                json={
+                    "fileIds": batch,
+                },
+                idempotent=True,
+            ),
+            merge=lambda results: models.FileInfosData(
+                fileList=[info for r in results for info in r.fileList]
+            ),
         )
 
     async def search(
@@ -224,27 +710,234 @@ class File:
             method="GET",
             endpoint="/api/v2/file/list",
             model=models.FileListData,
-            params={
-                "parentFileId": dir_id,
-                "limit": limit,
-                "searchData": search_data,
-                "searchMode": (
-                    int(precised_search) if precised_search is not None else None
-                ),
-                "lastFileId": first_id,
-            },
+            params=_search_params(
+                dir_id, limit, search_data, precised_search, first_id
+            ),
         )
 
-    async def move(self, file_ids: list[int], target_dir_id: int) -> None:
-        return await self._client.request(
-            method="POST",
-            endpoint="/api/v1/file/move",
-            model=NoneType,
-            json={
-                "fileIDs": file_ids,
-                "toParentFileID": target_dir_id,
-            },
+    async def search_records(
+        self,
+        dir_id: int = 0,
+        limit: int = 100,
+        search_data: str | None = None,
+        precised_search: bool | None = None,
+        first_id: int | None = None,
+    ) -> tuple[int, list[models.FileRecord]]:
+        data = await self._client.request_lean(
+            method="GET",
+            endpoint="/api/v2/file/list",
+            model=models.FileListData,
+            params=_search_params(
+                dir_id, limit, search_data, precised_search, first_id
+            ),
         )
+        return cast(int, data["lastFileId"]), [
+            models.FileRecord.from_json(item)
+            for item in cast(list[dict[str, object]], data["fileList"])
+        ]
+
+    async def _list_page(
+        self,
+        dir_id: int,
+        limit: int,
+        search_data: str | None,
+        precised_search: bool | None,
+        first_id: int | None,
+        lean: bool,
+    ) -> tuple[int, Sequence[models.FileBasicInfo | models.FileRecord]]:
+        if lean:
+            return await self.search_records(
+                dir_id, limit, search_data, precised_search, first_id
+            )
+        page = await self.search(dir_id, limit, search_data, precised_search, first_id)
+        return page.lastFileId, page.fileList
+
+    @overload
+    def iter_list(
+        self,
+        dir_id: int = 0,
+        limit: int = 100,
+        search_data: str | None = None,
+        precised_search: bool | None = None,
+        prefetch: int = 1,
+        lean: Literal[False] = False,
+    ) -> AsyncIterator[models.FileBasicInfo]: ...
+
+    @overload
+    def iter_list(
+        self,
+        dir_id: int = 0,
+        limit: int = 100,
+        search_data: str | None = None,
+        precised_search: bool | None = None,
+        prefetch: int = 1,
+        *,
+        lean: Literal[True],
+    ) -> AsyncIterator[models.FileRecord]: ...
+
+    @overload
+    def iter_list(
+        self,
+        dir_id: int = 0,
+        limit: int = 100,
+        search_data: str | None = None,
+        precised_search: bool | None = None,
+        prefetch: int = 1,
+        lean: bool = False,
+    ) -> AsyncIterator[models.FileBasicInfo | models.FileRecord]: ...
+
+    async def iter_list(
+        self,
+        dir_id: int = 0,
+        limit: int = 100,
+        search_data: str | None = None,
+        precised_search: bool | None = None,
+        prefetch: int = 1,
+        lean: bool = False,
+    ) -> AsyncIterator[models.FileBasicInfo | models.FileRecord]:
+        pages: Queue[
+            tuple[int, Sequence[models.FileBasicInfo | models.FileRecord]]
+            | BaseException
+        ] = Queue(max(prefetch, 1))
+
+        async def produce() -> None:
+            first_id: int | None = None
+            try:
+                while True:
+                    page = await self._list_page(
+                        dir_id, limit, search_data, precised_search, first_id, lean
+                    )
+                    await pages.put(page)
+                    if page[0] == -1:
+                        return
+                    first_id = page[0]
+            except Exception as e:
+                await pages.put(e)
+
+        producer = create_task(produce())
+        try:
+            while True:
+                page = await pages.get()
+                if isinstance(page, BaseException):
+                    raise page
+                last_id, file_list = page
+                for info in file_list:
+                    yield info
+                if last_id == -1:
+                    return
+        finally:
+            _ = producer.cancel()
+
+    @overload
+    def walk(
+        self,
+        root_id: int = 0,
+        concurrency: int = 8,
+        skip_trashed: bool = False,
+        max_depth: int | None = None,
+        include: Callable[[str, models.FileBasicInfo], bool] | None = None,
+        descend: Callable[[str, models.FileBasicInfo], bool] | None = None,
+        lean: Literal[False] = False,
+    ) -> AsyncIterator[tuple[str, models.FileBasicInfo]]: ...
+
+    @overload
+    def walk(
+        self,
+        root_id: int = 0,
+        concurrency: int = 8,
+        skip_trashed: bool = False,
+        max_depth: int | None = None,
+        include: Callable[[str, models.FileRecord], bool] | None = None,
+        descend: Callable[[str, models.FileRecord], bool] | None = None,
+        *,
+        lean: Literal[True],
+    ) -> AsyncIterator[tuple[str, models.FileRecord]]: ...
+
+    @overload
+    def walk(
+        self,
+        root_id: int = 0,
+        concurrency: int = 8,
+        skip_trashed: bool = False,
+        max_depth: int | None = None,
+        include: Callable[[str, Never], bool] | None = None,
+        descend: Callable[[str, Never], bool] | None = None,
+        lean: bool = False,
+    ) -> AsyncIterator[tuple[str, models.FileBasicInfo | models.FileRecord]]: ...
+
+    async def walk(
+        self,
+        root_id: int = 0,
+        concurrency: int = 8,
+        skip_trashed: bool = False,
+        max_depth: int | None = None,
+        include: Callable[[str, Never], bool] | None = None,
+        descend: Callable[[str, Never], bool] | None = None,
+        lean: bool = False,
+    ) -> AsyncIterator[tuple[str, models.FileBasicInfo | models.FileRecord]]:
+        dirs: Queue[tuple[int, str, int]] = Queue()
+        results: Queue[
+            tuple[str, models.FileBasicInfo | models.FileRecord] | BaseException | None
+        ] = Queue(concurrency * 100)
+        dirs.put_nowait((root_id, "", 1))
+
+        async def worker() -> None:
+            while True:
+                dir_id, dir_path, depth = await dirs.get()
+                try:
+                    async for info in self.iter_list(dir_id, lean=lean):
+                        if skip_trashed and info.trashed:
+                            continue
+                        path = f"{dir_path}/{info.filename}".lstrip("/")
+                        if (
+                            info.type
+                            and (max_depth is None or depth < max_depth)
+                            and (
+                                descend is None or cast(WalkFilter, descend)(path, info)
+                            )
+                        ):
+                            dirs.put_nowait((info.fileId, path, depth + 1))
+                        if include is None or cast(WalkFilter, include)(path, info):
+                            await results.put((path, info))
+                except Exception as e:
+                    await results.put(e)
+                finally:
+                    dirs.task_done()
+
+        async def finish() -> None:
+            await dirs.join()
+            await results.put(None)
+
+        tasks = [create_task(worker()) for _ in range(concurrency)]
+        tasks.append(create_task(finish()))
+        try:
+            while (result := await results.get()) is not None:
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            for task in tasks:
+                _ = task.cancel()
+
+    async def move(self, file_ids: list[int], target_dir_id: int) -> None:
+        try:
+            return await self._batched(
+                endpoint="/api/v1/file/move",
+                items=file_ids,
+                send=lambda batch: self._client.request(
+                    method="POST",
+                    endpoint="/api/v1/file/move",
+                    model=NoneType,
+                    json={
+                        "fileIDs": batch,
+                        "toParentFileID": target_dir_id,
+                    },
+                    idempotent=True,
+                ),
+                merge=lambda _: None,
+            )
+        finally:
+            self.path_cache.invalidate_ids(file_ids)
 
     async def download_info(self, file_id: int) -> models.DownloadData:
         return await self._client.request(
@@ -256,14 +949,324 @@ class File:
             },
         )
 
-    async def download(self, file_id: int, local_path: str) -> None:
+    async def _with_retry(
+        self,
+        action: Callable[[], Awaitable[T]],
+        what: str,
+        tracker: TransferTracker | None = None,
+    ) -> T:
+        policy = self._client.scheduler.retry
+        attempt = 0
+        while True:
+            try:
+                return await action()
+            except (HTTPStatusError, TransportError) as e:
+                if not policy.should_retry(e, attempt):
+                    raise
+                delay = policy.delay(e, attempt)
+                logger.info(f"Retrying {what} in {delay:.2f}s after: {e}")
+                if tracker is not None:
+                    tracker.retry()
+                await sleep(delay)
+                attempt += 1
+
+    async def _probe_download(self, url: str) -> tuple[str, int] | None:
+        async def probe() -> tuple[str, int] | None:
+            async with self._client.get_client("download").stream(
+                method="GET",
+                url=url,
+                headers={"Range": "bytes=0-0"},
+                follow_redirects=True,
+            ) as resp:
+                _ = resp.raise_for_status()
+                content_range = cast(str, resp.headers.get("Content-Range", ""))
+                if resp.status_code != 206 or "/" not in content_range:
+                    return None
+                total = content_range.rsplit("/", 1)[1]
+                if not total.isdigit():
+                    return None
+                return str(resp.url), int(total)
+
+        return await self._with_retry(probe, f"probing {url}")
+
+    async def _download_stream(
+        self,
+        url: str,
+        local_path: str,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        tracker: TransferTracker | None = None,
+    ) -> str:
+        file_md5 = md5()
+        received = 0
+        started = perf_counter()
+        try:
+            async with self._client.get_client("download").stream(
+                method="GET", url=url, follow_redirects=True
+            ) as resp:
+                _ = resp.raise_for_status()
+                with open(local_path, "wb") as f:
+                    async for chunk in resp.aiter_bytes():
+                        await self.transfers.acquire("download", len(chunk), priority)
+                        file_md5.update(chunk)
+                        _ = f.write(chunk)
+                        received += len(chunk)
+                        if tracker is not None:
+                            tracker.advance(len(chunk))
+        except Exception as e:
+            if tracker is not None:
+                tracker.advance(-received)
+                tracker.part(
+                    urlsplit(url).netloc, received, perf_counter() - started, e
+                )
+            raise
+        if tracker is not None:
+            tracker.part(resp.url.netloc.decode(), received, perf_counter() - started)
+        return file_md5.hexdigest()
+
+    async def _download_range(
+        self,
+        url: str,
+        local_path: str,
+        start: int,
+        end: int,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        tracker: TransferTracker | None = None,
+    ) -> list[bytes]:
+        chunks: list[bytes] = []
+        received = 0
+        started = perf_counter()
+        try:
+            async with self._client.get_client("download").stream(
+                method="GET",
+                url=url,
+                headers={"Range": f"bytes={start}-{end - 1}"},
+                follow_redirects=True,
+            ) as resp:
+                _ = resp.raise_for_status()
+                if resp.status_code != 206:
+                    raise TransferException(f"{url} ignored range {start}-{end - 1}")
+                with open(local_path, "r+b") as f:
+                    _ = f.seek(start)
+                    async for chunk in resp.aiter_bytes():
+                        await self.transfers.acquire("download", len(chunk), priority)
+                        chunks.append(chunk)
+                        _ = f.write(chunk)
+                        received += len(chunk)
+                        if tracker is not None:
+                            tracker.advance(len(chunk))
+                    if f.tell() != end:
+                        raise TransferException(
+                            f"{url} returned {f.tell() - start} bytes "
+                            + f"for range {start}-{end - 1}"
+                        )
+        except Exception as e:
+            if tracker is not None:
+                tracker.advance(-received)
+                tracker.part(
+                    urlsplit(url).netloc, received, perf_counter() - started, e
+                )
+            raise
+        if tracker is not None:
+            tracker.part(urlsplit(url).netloc, received, perf_counter() - started)
+        return chunks
+
+    async def _download_ranges(
+        self,
+        file_id: int,
+        url: str,
+        part_path: str,
+        sidecar: DownloadSidecar,
+        sidecar_path: str,
+        connections: int,
+        digest: PartDigest,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        tracker: TransferTracker | None = None,
+    ) -> None:
+        parts = (
+            start
+            for start in range(0, sidecar.size, sidecar.partSize)
+            if start not in sidecar.done
+        )
+        current_url = url
+        refresh_lock = Lock()
+
+        async def refresh_url(stale_url: str) -> str:
+            nonlocal current_url
+            async with refresh_lock:
+                if current_url == stale_url:
+                    logger.info(f"Download URL of {file_id} expired, refreshing")
+                    download_info = await self.download_info(file_id)
+                    probed = await self._probe_download(download_info.downloadUrl)
+                    if probed is None:
+                        raise TransferException(f"{file_id} no longer supports ranges")
+                    current_url = probed[0]
+            return current_url
+
+        async def fetch(start: int, end: int) -> list[bytes]:
+            url = current_url
+            try:
+                return await self._download_range(
+                    url, part_path, start, end, priority, tracker
+                )
+            except HTTPStatusError as e:
+                if e.response.status_code not in EXPIRED_URL_STATUSES:
+                    raise
+                if tracker is not None:
+                    tracker.retry()
+                url = await refresh_url(url)
+                return await self._download_range(
+                    url, part_path, start, end, priority, tracker
+                )
+
+        async def worker() -> None:
+            for start in parts:
+                end = min(start + sidecar.partSize, sidecar.size)
+                chunks = await self._with_retry(
+                    lambda: fetch(start, end),
+                    f"range {start}-{end - 1} of {file_id}",
+                    tracker,
+                )
+                sidecar.done.add(start)
+                sidecar.save(sidecar_path)
+                await digest.feed(start, chunks)
+
+        _ = await gather_or_cancel(*(worker() for _ in range(connections)))
+
+    async def download(
+        self,
+        file_id: int,
+        local_path: str,
+        connections: int | None = None,
+        info: models.FileBasicInfo | models.FileRecord | None = None,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        progress: TransferListener | None = None,
+    ) -> None:
+        connections = connections or self.download_connections
+        if info is None:
+            infos = await self.infos([file_id])
+            if not infos.fileList:
+                raise TransferException(f"{file_id} does not exist")
+            info = infos.fileList[0]
+        part_path = f"{local_path}.part"
+        sidecar_path = f"{part_path}.json"
+        tracker = self._tracker("download", local_path, info.size, progress)
+
         download_info = await self.download_info(file_id)
         logger.info(f"Downloading {download_info.downloadUrl} to {local_path}")
-        async with self._client.get_client().stream(
-            method="GET", url=download_info.downloadUrl, follow_redirects=True
-        ) as resp:
-            _ = resp.raise_for_status()
-            with open(local_path, "wb") as f:
-                async for chunk in resp.aiter_bytes():
-                    _ = f.write(chunk)
+        probed = None
+        if info.size > DOWNLOAD_PART_SIZE:
+            probed = await self._probe_download(download_info.downloadUrl)
+        if probed is None:
+            file_md5 = await self._with_retry(
+                lambda: self._download_stream(
+                    download_info.downloadUrl, part_path, priority, tracker
+                ),
+                f"download of {file_id}",
+                tracker,
+            )
+        else:
+            url, size = probed
+            if size != info.size:
+                raise TransferException(
+                    f"{file_id} is {info.size} bytes but {url} serves {size}"
+                )
+            sidecar = DownloadSidecar.load(sidecar_path)
+            if (
+                sidecar is None
+                or not os.path.exists(part_path)
+                or sidecar.fileId != file_id
+                or sidecar.etag != info.etag
+                or sidecar.size != size
+            ):
+                sidecar = DownloadSidecar(
+                    fileId=file_id,
+                    etag=info.etag,
+                    size=size,
+                    partSize=DOWNLOAD_PART_SIZE,
+                )
+                with open(part_path, "wb") as f:
+                    _ = f.truncate(size)
+                sidecar.save(sidecar_path)
+            elif sidecar.done:
+                logger.info(
+                    f"Resuming {local_path} with {len(sidecar.done)} parts done"
+                )
+            digest = PartDigest(part_path, sidecar.partSize, connections)
+            if tracker is not None:
+                tracker.resume(
+                    sum(min(sidecar.partSize, size - start) for start in sidecar.done)
+                )
+            for start in sorted(sidecar.done):
+                await digest.feed(start)
+            await self._download_ranges(
+                file_id=file_id,
+                url=url,
+                part_path=part_path,
+                sidecar=sidecar,
+                sidecar_path=sidecar_path,
+                connections=connections,
+                digest=digest,
+                priority=priority,
+                tracker=tracker,
+            )
+            file_md5 = digest.hexdigest()
+        if os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
+        if file_md5 != info.etag.lower():
+            os.remove(part_path)
+            raise TransferException(
+                f"{local_path} has MD5 {file_md5} but {file_id} has etag {info.etag}"
+            )
+        os.replace(part_path, local_path)
+        if tracker is not None:
+            tracker.finish()
         logger.info(f"Downloaded {download_info.downloadUrl} to {local_path}")
+
+    async def download_tree(
+        self,
+        remote_dir_id: int,
+        local_dir: str,
+        concurrency: int = 8,
+        connections: int | None = None,
+        priority: TransferPriority = TransferPriority.NORMAL,
+        progress: TransferListener | None = None,
+    ) -> list[TransferResult]:
+        queue: Queue[tuple[str, models.FileRecord] | None] = Queue(concurrency * 2)
+        results: list[TransferResult] = []
+
+        async def producer() -> None:
+            try:
+                async for rel_path, info in self.walk(
+                    remote_dir_id, concurrency=concurrency, skip_trashed=True, lean=True
+                ):
+                    local_path = os.path.join(local_dir, *rel_path.split("/"))
+                    if info.type:
+                        os.makedirs(local_path, exist_ok=True)
+                    else:
+                        await queue.put((rel_path, info))
+            finally:
+                for _ in range(concurrency):
+                    await queue.put(None)
+
+        async def worker() -> None:
+            while (item := await queue.get()) is not None:
+                rel_path, info = item
+                local_path = os.path.join(local_dir, *rel_path.split("/"))
+                try:
+                    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                    await self.download(
+                        info.fileId,
+                        local_path,
+                        connections=connections,
+                        info=info,
+                        priority=priority,
+                        progress=progress,
+                    )
+                    results.append(TransferResult(local_path, rel_path, info.fileId))
+                except Exception as e:
+                    logger.warning(f"Downloading {rel_path} failed: {e}")
+                    results.append(TransferResult(local_path, rel_path, info.fileId, e))
+
+        os.makedirs(local_dir, exist_ok=True)
+        _ = await gather_or_cancel(producer(), *(worker() for _ in range(concurrency)))
+        return results
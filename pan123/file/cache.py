@@ -0,0 +1,56 @@
+__all__ = ["PathCache"]
+
+from collections import OrderedDict
+from collections.abc import Iterable
+from time import monotonic
+
+from .models import FileBasicInfo
+
+
+class PathCache:
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        self._entries: OrderedDict[tuple[int, str], tuple[float, FileBasicInfo]] = (
+            OrderedDict()
+        )
+        self._keys: dict[int, tuple[int, str]] = {}
+
+    def get(self, parent_id: int, name: str) -> FileBasicInfo | None:
+        key = (parent_id, name)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, info = entry
+        if expires <= monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return info
+
+    def put(self, info: FileBasicInfo) -> None:
+        key = (info.parentFileId, info.filename)
+        self._remove(key)
+        self.invalidate_ids((info.fileId,))
+        self._entries[key] = (monotonic() + self.ttl, info)
+        self._keys[info.fileId] = key
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, parent_id: int, name: str) -> None:
+        self._remove((parent_id, name))
+
+    def invalidate_ids(self, file_ids: Iterable[int]) -> None:
+        for file_id in file_ids:
+            key = self._keys.get(file_id)
+            if key is not None:
+                self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys.clear()
+
+    def _remove(self, key: tuple[int, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            _ = self._keys.pop(entry[1].fileId, None)
@@ -0,0 +1,43 @@
+__all__ = ["RemoteDirs"]
+
+from asyncio import Semaphore, Task, create_task, gather
+from collections.abc import Awaitable, Callable
+
+from ..log import logger
+
+
+class RemoteDirs:
+    def __init__(
+        self,
+        mkdir: Callable[[str, int], Awaitable[int]],
+        root_id: int,
+        known: dict[str, int] | None = None,
+        concurrency: int = 8,
+    ):
+        self._mkdir: Callable[[str, int], Awaitable[int]] = mkdir
+        self.root_id: int = root_id
+        self._known: dict[str, int] = known or {}
+        self._tasks: dict[str, Task[int]] = {}
+        self._limit: Semaphore = Semaphore(concurrency)
+
+    def ensure(self, rel_dir: str) -> Task[int]:
+        task = self._tasks.get(rel_dir)
+        if task is None:
+            task = self._tasks[rel_dir] = create_task(self._make(rel_dir))
+        return task
+
+    async def _make(self, rel_dir: str) -> int:
+        if not rel_dir:
+            return self.root_id
+        if rel_dir in self._known:
+            return self._known[rel_dir]
+        parent, _, name = rel_dir.rpartition("/")
+        parent_id = await self.ensure(parent)
+        async with self._limit:
+            return await self._mkdir(name, parent_id)
+
+    async def wait(self) -> None:
+        results = await gather(*self._tasks.values(), return_exceptions=True)
+        for rel_dir, result in zip(self._tasks, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Creating remote directory {rel_dir} failed: {result}")
@@ -3,6 +3,8 @@ from enum import IntEnum
 __all__ = [
     "CopyProgressEnum",
     "FileCategoryEnum",
+    "SyncModeEnum",
+    "SyncActionEnum",
 ]
 
 
@@ -19,3 +21,18 @@ class FileCategoryEnum(IntEnum):
     VIDEO = 2
     IMAGE = 3
     COMPRESSED = 10
+
+
+class SyncModeEnum(IntEnum):
+    UPLOAD = 0
+    DOWNLOAD = 1
+    BOTH = 2
+
+
+class SyncActionEnum(IntEnum):
+    UPLOAD = 0
+    DOWNLOAD = 1
+    DELETE_REMOTE = 2
+    DELETE_LOCAL = 3
+    MOVE_REMOTE = 4
+    MOVE_LOCAL = 5
@@ -0,0 +1,116 @@
+__all__ = ["file_md5", "HashCache"]
+
+import os
+import sqlite3
+from asyncio import to_thread
+from hashlib import md5 as md5_hash
+from time import time
+from typing import cast
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    md5 TEXT NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_used ON hashes (used);
+"""
+COMMIT_EVERY = 256
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def file_md5(path: str) -> str:
+    hasher = md5_hash()
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class HashCache:
+    def __init__(
+        self, storage_file: str = "hash_cache.sqlite3", max_entries: int = 1_000_000
+    ):
+        self.storage_file: str = storage_file
+        self.max_entries: int = max_entries
+        self._db: sqlite3.Connection = sqlite3.connect(storage_file)
+        _ = self._db.execute("PRAGMA journal_mode = WAL")
+        _ = self._db.execute("PRAGMA synchronous = NORMAL")
+        _ = self._db.executescript(SCHEMA)
+        self._writes: int = 0
+        self._touched: dict[str, float] = {}
+
+    def get(self, path: str, stat: os.stat_result) -> str | None:
+        path = os.path.abspath(path)
+        row = cast(
+            tuple[str] | None,
+            self._db.execute(
+                "SELECT md5 FROM hashes "
+                + "WHERE path = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_ino, stat.st_size, stat.st_mtime_ns),
+            ).fetchone(),
+        )
+        if row is None:
+            return None
+        self._touched[path] = time()
+        if len(self._touched) >= COMMIT_EVERY:
+            self.flush()
+        return row[0]
+
+    def put(self, path: str, stat: os.stat_result, md5: str) -> None:
+        _ = self._db.execute(
+            "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                os.path.abspath(path),
+                stat.st_ino,
+                stat.st_size,
+                stat.st_mtime_ns,
+                md5,
+                time(),
+            ),
+        )
+        self._db.commit()
+        self._written()
+
+    async def md5(self, path: str, stat: os.stat_result) -> str:
+        cached = self.get(path, stat)
+        if cached is not None:
+            return cached
+        file_hash = await to_thread(file_md5, path)
+        self.put(path, stat, file_hash)
+        return file_hash
+
+    def flush(self) -> None:
+        if not self._touched:
+            return
+        _ = self._db.executemany(
+            "UPDATE hashes SET used = ? WHERE path = ?",
+            ((used, path) for path, used in self._touched.items()),
+        )
+        self._db.commit()
+        self._touched.clear()
+
+    def evict(self) -> None:
+        self.flush()
+        (count,) = cast(
+            tuple[int], self._db.execute("SELECT count(*) FROM hashes").fetchone()
+        )
+        if count > self.max_entries:
+            _ = self._db.execute(
+                "DELETE FROM hashes WHERE path IN "
+                + "(SELECT path FROM hashes ORDER BY used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        self._db.commit()
+
+    def close(self) -> None:
+        self.evict()
+        self._db.close()
+
+    def _written(self) -> None:
+        self._writes += 1
+        if self._writes % COMMIT_EVERY == 0:
+            self.evict()
@@ -0,0 +1,333 @@
+__all__ = ["FileSource", "FileIndex"]
+
+import sqlite3
+from collections.abc import AsyncIterator, Iterable
+from datetime import datetime
+from typing import Literal, Protocol, cast
+
+from ..log import logger
+from ..utils import gather_or_cancel
+from .models import FileBasicInfo, FileInfosData, FileRecord
+
+COLUMNS = (
+    "fileId",
+    "filename",
+    "parentFileId",
+    "type",
+    "etag",
+    "size",
+    "category",
+    "status",
+    "trashed",
+)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    fileId INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    parentFileId INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    category INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    trashed INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    updateAt TEXT
+);
+CREATE INDEX IF NOT EXISTS files_parent ON files (parentFileId);
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+CREATE INDEX IF NOT EXISTS files_filename ON files (filename);
+CREATE INDEX IF NOT EXISTS files_etag ON files (etag);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+InfoRow = tuple[int, str, int, int, str, int, int, int, int]
+PathRow = tuple[int, str, int, int, str, int, int, int, int, str]
+UPSERT = (
+    f"INSERT INTO files ({', '.join(COLUMNS)}, path) "
+    + f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))}) "
+    + "ON CONFLICT (fileId) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in (*COLUMNS[1:], "path"))
+)
+
+
+def _row(path: str, info: FileBasicInfo | FileRecord) -> tuple[object, ...]:
+    return (
+        info.fileId,
+        info.filename,
+        info.parentFileId,
+        int(info.type),
+        info.etag,
+        info.size,
+        int(info.category),
+        info.status,
+        int(info.trashed),
+        path,
+    )
+
+
+def _info(row: tuple[object, ...]) -> FileBasicInfo:
+    return FileBasicInfo.model_validate(dict(zip(COLUMNS, row)))
+
+
+class FileSource(Protocol):
+    def iter_list(
+        self, dir_id: int = 0, *, lean: Literal[True]
+    ) -> AsyncIterator[FileRecord]: ...
+
+    def walk(
+        self,
+        root_id: int = 0,
+        concurrency: int = 8,
+        skip_trashed: bool = False,
+        *,
+        lean: Literal[True],
+    ) -> AsyncIterator[tuple[str, FileRecord]]: ...
+
+    async def infos(self, file_ids: list[int]) -> FileInfosData: ...
+
+
+class FileIndex:
+    def __init__(self, files: FileSource, storage_file: str = "file_index.sqlite3"):
+        self._files: FileSource = files
+        self.storage_file: str = storage_file
+        self._db: sqlite3.Connection = sqlite3.connect(storage_file)
+        _ = self._db.executescript(SCHEMA)
+
+    @property
+    def root_id(self) -> int | None:
+        row = cast(
+            tuple[str] | None,
+            self._db.execute("SELECT value FROM meta WHERE key = 'root'").fetchone(),
+        )
+        return None if row is None else int(row[0])
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _upsert(self, rows: Iterable[tuple[object, ...]]) -> None:
+        _ = self._db.executemany(UPSERT, rows)
+
+    def _delete_tree(self, file_id: int, path: str) -> None:
+        _ = self._db.execute("DELETE FROM files WHERE fileId = ?", (file_id,))
+        _ = self._db.execute(
+            "DELETE FROM files WHERE substr(path, 1, ?) = ?",
+            (len(path) + 1, f"{path}/"),
+        )
+
+    def _move_tree(self, old_path: str, new_path: str) -> None:
+        _ = self._db.execute(
+            "UPDATE files SET path = ? || substr(path, ?) "
+            + "WHERE substr(path, 1, ?) = ?",
+            (f"{new_path}/", len(old_path) + 2, len(old_path) + 1, f"{old_path}/"),
+        )
+
+    async def _index_tree(self, dir_id: int, dir_path: str, concurrency: int) -> None:
+        rows: list[tuple[object, ...]] = []
+        async for path, info in self._files.walk(
+            dir_id, concurrency=concurrency, skip_trashed=True, lean=True
+        ):
+            rows.append(_row(f"{dir_path}/{path}".lstrip("/"), info))
+            if len(rows) >= 1000:
+                self._upsert(rows)
+                rows.clear()
+        self._upsert(rows)
+
+    async def _dir_update_times(self, dir_ids: list[int]) -> dict[int, datetime]:
+        if not dir_ids:
+            return {}
+        infos = await self._files.infos(dir_ids)
+        return {
+            info.fileId: info.updateAt
+            for info in infos.fileList
+            if info.type and not info.trashed
+        }
+
+    def _store_update_times(self, update_times: dict[int, datetime]) -> None:
+        _ = self._db.executemany(
+            "UPDATE files SET updateAt = ? WHERE fileId = ?",
+            (
+                (updated.isoformat(), file_id)
+                for file_id, updated in update_times.items()
+            ),
+        )
+
+    async def build(self, root_id: int = 0, concurrency: int = 8) -> None:
+        _ = self._db.execute("DELETE FROM files")
+        _ = self._db.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('root', ?)", (str(root_id),)
+        )
+        await self._index_tree(root_id, "", concurrency)
+        dir_ids = [
+            row[0]
+            for row in cast(
+                Iterable[tuple[int]],
+                self._db.execute("SELECT fileId FROM files WHERE type"),
+            )
+        ]
+        self._store_update_times(await self._dir_update_times(dir_ids))
+        self._db.commit()
+
+    async def _refresh_dir(self, dir_id: int, dir_path: str, concurrency: int) -> None:
+        listed = [
+            info
+            async for info in self._files.iter_list(dir_id, lean=True)
+            if not info.trashed
+        ]
+        known: dict[int, tuple[str, int]] = {
+            row[0]: (row[1], row[2])
+            for row in cast(
+                Iterable[tuple[int, str, int]],
+                self._db.execute(
+                    "SELECT fileId, path, type FROM files WHERE parentFileId = ?",
+                    (dir_id,),
+                ),
+            )
+        }
+        listed_ids = {info.fileId for info in listed}
+        for file_id, (path, _) in known.items():
+            if file_id not in listed_ids:
+                self._delete_tree(file_id, path)
+
+        new_dirs: list[tuple[int, str]] = []
+        for info in listed:
+            if not info.type:
+                continue
+            path = f"{dir_path}/{info.filename}".lstrip("/")
+            old = cast(
+                tuple[str] | None,
+                self._db.execute(
+                    "SELECT path FROM files WHERE fileId = ?", (info.fileId,)
+                ).fetchone(),
+            )
+            if old is None:
+                new_dirs.append((info.fileId, path))
+            elif old[0] != path:
+                self._move_tree(old[0], path)
+        self._upsert(
+            _row(f"{dir_path}/{info.filename}".lstrip("/"), info) for info in listed
+        )
+        for new_dir_id, new_dir_path in new_dirs:
+            await self._index_tree(new_dir_id, new_dir_path, concurrency)
+
+    async def refresh(self, concurrency: int = 8) -> int:
+        root_id = self.root_id
+        if root_id is None:
+            raise RuntimeError(f"{self.storage_file} has not been built yet")
+        known = {
+            row[0]: (row[1], row[2])
+            for row in cast(
+                Iterable[tuple[int, str, str | None]],
+                self._db.execute("SELECT fileId, path, updateAt FROM files WHERE type"),
+            )
+        }
+        update_times = await self._dir_update_times(list(known))
+        for dir_id, (path, _) in known.items():
+            if dir_id not in update_times:
+                self._delete_tree(dir_id, path)
+
+        changed = iter(
+            [(root_id, "")]
+            + [
+                (dir_id, known[dir_id][0])
+                for dir_id, updated in update_times.items()
+                if known[dir_id][1] != updated.isoformat()
+            ]
+        )
+        refreshed = 0
+
+        async def worker() -> None:
+            nonlocal refreshed
+            for dir_id, _ in changed:
+                row = cast(
+                    tuple[str] | None,
+                    self._db.execute(
+                        "SELECT path FROM files WHERE fileId = ?", (dir_id,)
+                    ).fetchone(),
+                )
+                if dir_id != root_id and row is None:
+                    continue
+                await self._refresh_dir(dir_id, row[0] if row else "", concurrency)
+                refreshed += 1
+
+        _ = await gather_or_cancel(*(worker() for _ in range(concurrency)))
+        new_dirs = [
+            row[0]
+            for row in cast(
+                Iterable[tuple[int]],
+                self._db.execute(
+                    "SELECT fileId FROM files WHERE type AND updateAt IS NULL"
+                ),
+            )
+        ]
+        update_times.update(await self._dir_update_times(new_dirs))
+        self._store_update_times(update_times)
+        self._db.commit()
+        logger.info(f"Refreshed {refreshed} changed directories of {self.storage_file}")
+        return refreshed
+
+    def get(self, path: str) -> FileBasicInfo | None:
+        row = cast(
+            InfoRow | None,
+            self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM files WHERE path = ?",
+                (path.strip("/"),),
+            ).fetchone(),
+        )
+        return None if row is None else _info(row)
+
+    def children(self, dir_id: int) -> list[tuple[str, FileBasicInfo]]:
+        return [
+            (row[-1], _info(row[:-1]))
+            for row in cast(
+                Iterable[PathRow],
+                self._db.execute(
+                    f"SELECT {', '.join(COLUMNS)}, path FROM files "
+                    + "WHERE parentFileId = ?",
+                    (dir_id,),
+                ),
+            )
+        ]
+
+    def find(
+        self,
+        name: str | None = None,
+        under: str | None = None,
+        etag: str | None = None,
+        min_size: int | None = None,
+        max_size: int | None = None,
+        is_dir: bool | None = None,
+    ) -> list[tuple[str, FileBasicInfo]]:
+        conditions: list[str] = []
+        params: list[object] = []
+        if name is not None:
+            conditions.append("filename GLOB ?")
+            params.append(name)
+        if under is not None and under.strip("/"):
+            prefix = f"{under.strip('/')}/"
+            conditions.append("substr(path, 1, ?) = ?")
+            params.extend((len(prefix), prefix))
+        if etag is not None:
+            conditions.append("etag = ?")
+            params.append(etag)
+        if min_size is not None:
+            conditions.append("size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            conditions.append("size <= ?")
+            params.append(max_size)
+        if is_dir is not None:
+            conditions.append("type = ?")
+            params.append(int(is_dir))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return [
+            (row[-1], _info(row[:-1]))
+            for row in cast(
+                Iterable[PathRow],
+                self._db.execute(
+                    f"SELECT {', '.join(COLUMNS)}, path FROM files {where} "
+                    + "ORDER BY path",
+                    params,
+                ),
+            )
+        ]
@@ -0,0 +1,71 @@
+__all__ = ["UploadJournalEntry", "UploadJournal"]
+
+import os
+
+from pydantic import BaseModel, Field
+
+
+class UploadJournalEntry(BaseModel):
+    preuploadID: str
+    sliceSize: int
+    servers: list[str]
+    done: set[int] = Field(default_factory=set)
+
+
+class _UploadJournalData(BaseModel):
+    entries: dict[str, UploadJournalEntry] = Field(default_factory=dict)
+
+
+class UploadJournal:
+    def __init__(self, storage_file: str = "upload_journal.json"):
+        self.storage_file: str = storage_file
+        self._data: _UploadJournalData = _UploadJournalData()
+        try:
+            with open(self.storage_file, "r") as f:
+                self._data = _UploadJournalData.model_validate_json(f.read())
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def key(
+        local_path: str,
+        size: int,
+        mtime_ns: int,
+        md5: str,
+        remote_path: str,
+        parent_id: int,
+    ) -> str:
+        return "|".join(
+            (
+                os.path.abspath(local_path),
+                str(size),
+                str(mtime_ns),
+                md5,
+                str(parent_id),
+                remote_path,
+            )
+        )
+
+    def get(self, key: str) -> UploadJournalEntry | None:
+        return self._data.entries.get(key)
+
+    def put(self, key: str, entry: UploadJournalEntry) -> None:
+        self._data.entries[key] = entry
+        self.save()
+
+    def mark_done(self, key: str, slice_no: int) -> None:
+        entry = self._data.entries.get(key)
+        if entry is None:
+            return
+        entry.done.add(slice_no)
+        self.save()
+
+    def discard(self, key: str) -> None:
+        if self._data.entries.pop(key, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        tmp_file = f"{self.storage_file}.tmp"
+        with open(tmp_file, "w") as f:
+            _ = f.write(self._data.model_dump_json())
+        os.replace(tmp_file, self.storage_file)
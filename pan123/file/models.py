@@ -10,6 +10,7 @@ __all__ = [
     "CopyProgressData",
     "RecoverData",
     "FileBasicInfo",
+    "FileRecord",
     "FileInfo",
     "FileInfosData",
     "FileListData",
@@ -17,6 +18,9 @@ __all__ = [
 ]
 
 from datetime import datetime
+from operator import itemgetter
+from collections.abc import Callable
+from typing import NamedTuple, cast
 
 from pydantic import BaseModel
 
@@ -86,6 +90,28 @@ class FileBasicInfo(BaseModel):
     trashed: bool
 
 
+class FileRecord(NamedTuple):
+    fileId: int
+    filename: str
+    parentFileId: int
+    type: int
+    etag: str
+    size: int
+    category: int
+    status: int
+    trashed: int
+
+    @classmethod
+    def from_json(cls, item: dict[str, object]) -> "FileRecord":
+        return cls._make(_record_fields(item))
+
+
+_record_fields = cast(
+    Callable[[dict[str, object]], tuple[object, ...]],
+    itemgetter(*FileRecord._fields),
+)
+
+
 class FileInfo(FileBasicInfo):
     punishFlag: int
     s3KeyFlag: str
@@ -0,0 +1,71 @@
+__all__ = ["DownloadSidecar", "PartDigest"]
+
+import os
+from _hashlib import HASH
+from asyncio import Lock, to_thread
+from hashlib import md5
+
+from pydantic import BaseModel, Field, ValidationError
+
+
+class DownloadSidecar(BaseModel):
+    fileId: int
+    etag: str
+    size: int
+    partSize: int
+    done: set[int] = Field(default_factory=set)
+
+    @classmethod
+    def load(cls, path: str) -> "DownloadSidecar | None":
+        try:
+            with open(path, "r") as f:
+                return cls.model_validate_json(f.read())
+        except (FileNotFoundError, ValidationError):
+            return None
+
+    def save(self, path: str) -> None:
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, "w") as f:
+            _ = f.write(self.model_dump_json())
+        os.replace(tmp_file, path)
+
+
+def _read_part(path: str, start: int, size: int) -> bytes:
+    with open(path, "rb") as f:
+        _ = f.seek(start)
+        return f.read(size)
+
+
+class PartDigest:
+    def __init__(self, part_path: str, part_size: int, max_buffered: int = 4):
+        self.part_path: str = part_path
+        self.part_size: int = part_size
+        self.max_buffered: int = max_buffered
+        self.offset: int = 0
+        self._md5: HASH = md5()
+        self._ready: dict[int, list[bytes] | None] = {}
+        self._lock: Lock = Lock()
+
+    def _update(self, chunks: list[bytes]) -> None:
+        for chunk in chunks:
+            self._md5.update(chunk)
+            self.offset += len(chunk)
+
+    async def feed(self, start: int, chunks: list[bytes] | None = None) -> None:
+        buffered = sum(1 for ready in self._ready.values() if ready is not None)
+        self._ready[start] = (
+            chunks if start == self.offset or buffered < self.max_buffered else None
+        )
+        async with self._lock:
+            while self.offset in self._ready:
+                chunks = self._ready.pop(self.offset)
+                if chunks is None:
+                    chunks = [
+                        await to_thread(
+                            _read_part, self.part_path, self.offset, self.part_size
+                        )
+                    ]
+                await to_thread(self._update, chunks)
+
+    def hexdigest(self) -> str:
+        return self._md5.hexdigest()
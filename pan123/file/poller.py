@@ -0,0 +1,130 @@
+__all__ = ["CompletionPoller"]
+
+from asyncio import (
+    Event,
+    Future,
+    Semaphore,
+    Task,
+    TimeoutError,
+    create_task,
+    gather,
+    get_running_loop,
+    wait_for,
+)
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import cast
+
+from ..exception import ClientException
+from ..log import logger
+from .models import UploadCompleteData
+
+
+@dataclass(slots=True)
+class _Pending:
+    future: "Future[int]"
+    next_poll: float
+    delay: float
+    deadline: float | None
+
+
+class CompletionPoller:
+    def __init__(
+        self,
+        complete: Callable[[str], Awaitable[UploadCompleteData]],
+        initial_delay: float = 0.5,
+        max_delay: float = 8.0,
+        backoff: float = 1.6,
+        concurrency: int = 8,
+    ):
+        self._complete: Callable[[str], Awaitable[UploadCompleteData]] = complete
+        self.initial_delay: float = initial_delay
+        self.max_delay: float = max_delay
+        self.backoff: float = backoff
+        self.concurrency: int = concurrency
+        self._pending: dict[str, _Pending] = {}
+        self._wakeup: Event = Event()
+        self._task: Task[None] | None = None
+
+    async def wait(self, preupload_id: str, timeout: float | None = None) -> int:
+        loop = get_running_loop()
+        now = loop.time()
+        pending = self._pending.get(preupload_id)
+        if pending is None or pending.future.done():
+            pending = _Pending(
+                future=loop.create_future(),
+                next_poll=now,
+                delay=self.initial_delay,
+                deadline=None if timeout is None else now + timeout,
+            )
+            self._pending[preupload_id] = pending
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = create_task(self._run())
+        return await pending.future
+
+    def _finish(
+        self, preupload_id: str, result: int | None, error: BaseException | None
+    ) -> None:
+        pending = self._pending.pop(preupload_id, None)
+        if pending is None or pending.future.done():
+            return
+        if error is not None:
+            pending.future.set_exception(error)
+        else:
+            pending.future.set_result(cast(int, result))
+
+    async def _poll(self, preupload_id: str, pending: _Pending) -> None:
+        try:
+            complete = await self._complete(preupload_id)
+        except Exception as e:
+            if not isinstance(e, ClientException):
+                return self._finish(preupload_id, None, e)
+            error = cast(ClientException[UploadCompleteData], e)
+            complete = error.response.data
+            if complete is None:
+                return self._finish(preupload_id, None, error)
+            logger.debug(f"Upload {preupload_id} is not merged yet: {error}")
+        if complete.completed:
+            return self._finish(preupload_id, complete.fileID, None)
+        now = get_running_loop().time()
+        if pending.deadline is not None and now >= pending.deadline:
+            return self._finish(
+                preupload_id,
+                None,
+                TimeoutError(f"Upload {preupload_id} was not merged in time"),
+            )
+        pending.next_poll = now + pending.delay
+        if pending.deadline is not None:
+            pending.next_poll = min(pending.next_poll, pending.deadline)
+        pending.delay = min(pending.delay * self.backoff, self.max_delay)
+
+    async def _run(self) -> None:
+        loop = get_running_loop()
+        semaphore = Semaphore(self.concurrency)
+
+        async def poll(preupload_id: str, pending: _Pending) -> None:
+            async with semaphore:
+                await self._poll(preupload_id, pending)
+
+        while self._pending:
+            self._wakeup.clear()
+            for preupload_id, pending in list(self._pending.items()):
+                if pending.future.done():
+                    del self._pending[preupload_id]
+            now = loop.time()
+            due = [
+                (preupload_id, pending)
+                for preupload_id, pending in self._pending.items()
+                if pending.next_poll <= now
+            ]
+            if due:
+                _ = await gather(*(poll(*item) for item in due))
+                continue
+            if not self._pending:
+                break
+            next_poll = min(pending.next_poll for pending in self._pending.values())
+            try:
+                _ = await wait_for(self._wakeup.wait(), next_poll - now)
+            except TimeoutError:
+                pass
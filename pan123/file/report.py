@@ -0,0 +1,15 @@
+__all__ = ["TransferResult"]
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class TransferResult:
+    local_path: str
+    remote_path: str
+    file_id: int | None
+    error: BaseException | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
@@ -0,0 +1,69 @@
+__all__ = ["ServerStats", "UploadServers"]
+
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass
+from time import monotonic
+
+
+@dataclass(slots=True)
+class ServerStats:
+    throughput: float = 0.0
+    error_rate: float = 0.0
+    in_flight: int = 0
+    failed_until: float = 0.0
+
+
+class UploadServers:
+    def __init__(self, smoothing: float = 0.3, cooldown: float = 30.0):
+        self.smoothing: float = smoothing
+        self.cooldown: float = cooldown
+        self._stats: dict[str, ServerStats] = {}
+
+    def stats(self, server: str) -> ServerStats:
+        stats = self._stats.get(server)
+        if stats is None:
+            stats = self._stats[server] = ServerStats()
+        return stats
+
+    def _expected_time(self, server: str) -> float:
+        stats = self.stats(server)
+        if not stats.throughput:
+            return stats.in_flight
+        return (stats.in_flight + 1) / (
+            stats.throughput * max(1 - stats.error_rate, 0.01)
+        )
+
+    def pick(self, servers: Sequence[str], exclude: Collection[str] = ()) -> str:
+        candidates = [server for server in servers if server not in exclude]
+        candidates = candidates or list(servers)
+        now = monotonic()
+        healthy = [
+            server for server in candidates if self.stats(server).failed_until <= now
+        ]
+        server = min(healthy or candidates, key=self._expected_time)
+        self.stats(server).in_flight += 1
+        return server
+
+    def release(self, server: str) -> None:
+        self.stats(server).in_flight -= 1
+
+    def record(
+        self,
+        server: str,
+        size: int,
+        latency: float,
+        error: BaseException | None = None,
+    ) -> None:
+        self.release(server)
+        stats = self.stats(server)
+        stats.error_rate += self.smoothing * ((error is not None) - stats.error_rate)
+        if error is not None:
+            stats.failed_until = monotonic() + self.cooldown
+            return
+        if latency > 0:
+            throughput = size / latency
+            stats.throughput = (
+                throughput
+                if not stats.throughput
+                else stats.throughput + self.smoothing * (throughput - stats.throughput)
+            )
@@ -0,0 +1,391 @@
+__all__ = ["SyncTarget", "SyncAction", "SyncPlan", "SyncEngine"]
+
+import os
+import shutil
+from asyncio import to_thread
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Literal, Protocol, cast
+
+from ..exception import BatchException
+from ..log import logger
+from ..utils import gather_or_cancel
+from .dirs import RemoteDirs
+from .enums import SyncActionEnum, SyncModeEnum
+from .hashcache import HashCache
+from .models import FileInfosData, FileRecord, RenameData
+
+
+class SyncTarget(Protocol):
+    hash_cache: HashCache | None
+
+    def walk(
+        self,
+        root_id: int = 0,
+        concurrency: int = 8,
+        skip_trashed: bool = False,
+        *,
+        lean: Literal[True],
+    ) -> AsyncIterator[tuple[str, FileRecord]]: ...
+
+    async def infos(self, file_ids: list[int]) -> FileInfosData: ...
+
+    async def mkdir_or_get(self, name: str, parent_id: int) -> int: ...
+
+    async def upload(
+        self,
+        local_path: str,
+        remote_path: str,
+        parent_id: int = 0,
+        do_cover: bool = False,
+    ) -> int: ...
+
+    async def download(self, file_id: int, local_path: str) -> None: ...
+
+    async def move(self, file_ids: list[int], target_dir_id: int) -> None: ...
+
+    async def rename(self, files: dict[int, str]) -> RenameData: ...
+
+    async def trash(self, file_ids: list[int]) -> None: ...
+
+
+@dataclass(slots=True)
+class SyncAction:
+    action: SyncActionEnum
+    path: str
+    source: str | None = None
+    file_id: int | None = None
+    error: BaseException | None = None
+
+
+@dataclass(slots=True)
+class SyncPlan:
+    local_dir: str
+    remote_dir_id: int
+    mode: SyncModeEnum
+    actions: list[SyncAction] = field(default_factory=list)
+    remote_dirs: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return all(action.error is None for action in self.actions)
+
+
+def _scan_local(local_dir: str) -> tuple[dict[str, os.stat_result], set[str]]:
+    local_files: dict[str, os.stat_result] = {}
+    local_dirs: set[str] = set()
+    for root, dirnames, filenames in os.walk(local_dir):
+        rel_root = os.path.relpath(root, local_dir).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root
+        local_dirs.update(f"{rel_root}/{name}".lstrip("/") for name in dirnames)
+        for name in filenames:
+            local_files[f"{rel_root}/{name}".lstrip("/")] = os.stat(
+                os.path.join(root, name)
+            )
+    return local_files, local_dirs
+
+
+def _parents(path: str) -> Iterator[str]:
+    return (path.rsplit("/", depth)[0] for depth in range(1, path.count("/") + 1))
+
+
+def _top_level(paths: Iterable[str], dirs: set[str]) -> list[str]:
+    return [
+        path
+        for path in sorted(paths)
+        if not any(parent in dirs for parent in _parents(path))
+    ]
+
+
+def _outside(paths: Iterable[str], roots: set[str]) -> set[str]:
+    return {
+        path
+        for path in paths
+        if path not in roots and not any(parent in roots for parent in _parents(path))
+    }
+
+
+class SyncEngine:
+    def __init__(
+        self,
+        files: SyncTarget,
+        concurrency: int = 8,
+        hash_cache: HashCache | None = None,
+    ):
+        self._files: SyncTarget = files
+        self.concurrency: int = concurrency
+        hash_cache = hash_cache or files.hash_cache
+        self._hold_hash_cache: bool = hash_cache is None
+        self.hash_cache: HashCache = hash_cache or HashCache()
+
+    def close(self) -> None:
+        if self._hold_hash_cache:
+            self.hash_cache.close()
+
+    def _local_path(self, plan: SyncPlan, path: str) -> str:
+        return os.path.join(plan.local_dir, *path.split("/"))
+
+    async def _run(
+        self,
+        items: Iterable[SyncAction],
+        action: Callable[[SyncAction], Awaitable[None]],
+    ) -> None:
+        pending = iter(items)
+
+        async def worker() -> None:
+            for item in pending:
+                try:
+                    await action(item)
+                except Exception as e:
+                    logger.warning(f"Sync {item.action.name} {item.path} failed: {e}")
+                    item.error = e
+
+        _ = await gather_or_cancel(*(worker() for _ in range(self.concurrency)))
+
+    async def _hash_all(
+        self, local_dir: str, paths: Iterable[str], stats: dict[str, os.stat_result]
+    ) -> dict[str, str]:
+        pending = iter(paths)
+        hashes: dict[str, str] = {}
+
+        async def worker() -> None:
+            for path in pending:
+                hashes[path] = await self.hash_cache.md5(
+                    os.path.join(local_dir, *path.split("/")), stats[path]
+                )
+
+        _ = await gather_or_cancel(*(worker() for _ in range(self.concurrency)))
+        return hashes
+
+    async def plan(
+        self,
+        local_dir: str,
+        remote_dir_id: int = 0,
+        mode: SyncModeEnum = SyncModeEnum.UPLOAD,
+        delete: bool = False,
+    ) -> SyncPlan:
+        plan = SyncPlan(local_dir=local_dir, remote_dir_id=remote_dir_id, mode=mode)
+        local_files, local_dirs = await to_thread(_scan_local, local_dir)
+        remote_files: dict[str, FileRecord] = {}
+        async for path, info in self._files.walk(
+            remote_dir_id, concurrency=self.concurrency, skip_trashed=True, lean=True
+        ):
+            if info.type:
+                plan.remote_dirs[path] = info.fileId
+            else:
+                remote_files[path] = info
+
+        conflicts: set[str] = set()
+        for path in local_files.keys() & plan.remote_dirs.keys():
+            logger.warning(f"Skipping {path}: file locally but directory remotely")
+            conflicts.add(path)
+        for path in remote_files.keys() & local_dirs:
+            logger.warning(f"Skipping {path}: directory locally but file remotely")
+            conflicts.add(path)
+        local_only = local_files.keys() - remote_files.keys() - plan.remote_dirs.keys()
+        remote_only = remote_files.keys() - local_files.keys() - local_dirs
+        local_extra_dirs = local_dirs - plan.remote_dirs.keys()
+        remote_extra_dirs = plan.remote_dirs.keys() - local_dirs
+        if conflicts:
+            local_only = _outside(local_only, conflicts)
+            remote_only = _outside(remote_only, conflicts)
+            local_extra_dirs = _outside(local_extra_dirs, conflicts)
+            remote_extra_dirs = _outside(remote_extra_dirs, conflicts)
+        common = local_files.keys() & remote_files.keys()
+
+        moving = delete and mode != SyncModeEnum.BOTH
+        remote_only_sizes = {remote_files[path].size for path in remote_only}
+        to_hash = [
+            path
+            for path in common
+            if local_files[path].st_size == remote_files[path].size
+        ]
+        if moving:
+            to_hash.extend(
+                path
+                for path in local_only
+                if local_files[path].st_size in remote_only_sizes
+            )
+        hashes = await self._hash_all(local_dir, to_hash, local_files)
+
+        changed = sorted(
+            path
+            for path in common
+            if hashes.get(path, "") != remote_files[path].etag.lower()
+        )
+        if mode == SyncModeEnum.BOTH and changed:
+            infos = await self._files.infos([remote_files[p].fileId for p in changed])
+            updated = {info.fileId: info.updateAt for info in infos.fileList}
+            for path in changed:
+                remote_updated = updated.get(remote_files[path].fileId)
+                if (
+                    remote_updated is not None
+                    and remote_updated.timestamp() > local_files[path].st_mtime
+                ):
+                    plan.actions.append(
+                        SyncAction(
+                            SyncActionEnum.DOWNLOAD,
+                            path,
+                            file_id=remote_files[path].fileId,
+                        )
+                    )
+                else:
+                    plan.actions.append(SyncAction(SyncActionEnum.UPLOAD, path))
+        else:
+            for path in changed:
+                if mode == SyncModeEnum.UPLOAD:
+                    plan.actions.append(SyncAction(SyncActionEnum.UPLOAD, path))
+                else:
+                    plan.actions.append(
+                        SyncAction(
+                            SyncActionEnum.DOWNLOAD,
+                            path,
+                            file_id=remote_files[path].fileId,
+                        )
+                    )
+
+        if moving:
+            by_content: dict[tuple[int, str], list[str]] = {}
+            for path in sorted(remote_only):
+                info = remote_files[path]
+                by_content.setdefault((info.size, info.etag.lower()), []).append(path)
+            for path in sorted(local_only):
+                if path not in hashes:
+                    continue
+                matches = by_content.get((local_files[path].st_size, hashes[path]))
+                if not matches:
+                    continue
+                remote_path = matches.pop()
+                remote_only.discard(remote_path)
+                local_only.discard(path)
+                if mode == SyncModeEnum.UPLOAD:
+                    plan.actions.append(
+                        SyncAction(
+                            SyncActionEnum.MOVE_REMOTE,
+                            path,
+                            source=remote_path,
+                            file_id=remote_files[remote_path].fileId,
+                        )
+                    )
+                else:
+                    plan.actions.append(
+                        SyncAction(SyncActionEnum.MOVE_LOCAL, remote_path, source=path)
+                    )
+
+        if mode != SyncModeEnum.DOWNLOAD:
+            plan.actions.extend(
+                SyncAction(SyncActionEnum.UPLOAD, path) for path in sorted(local_only)
+            )
+        elif delete:
+            plan.actions.extend(
+                SyncAction(SyncActionEnum.DELETE_LOCAL, path)
+                for path in _top_level(local_only | local_extra_dirs, local_extra_dirs)
+            )
+        if mode != SyncModeEnum.UPLOAD:
+            plan.actions.extend(
+                SyncAction(
+                    SyncActionEnum.DOWNLOAD, path, file_id=remote_files[path].fileId
+                )
+                for path in sorted(remote_only)
+            )
+        elif delete:
+            plan.actions.extend(
+                SyncAction(
+                    SyncActionEnum.DELETE_REMOTE,
+                    path,
+                    file_id=(
+                        plan.remote_dirs[path]
+                        if path in remote_extra_dirs
+                        else remote_files[path].fileId
+                    ),
+                )
+                for path in _top_level(
+                    remote_only | remote_extra_dirs, remote_extra_dirs
+                )
+            )
+        return plan
+
+    async def execute(self, plan: SyncPlan) -> SyncPlan:
+        files = self._files
+        remote_dirs = RemoteDirs(
+            files.mkdir_or_get, plan.remote_dir_id, dict(plan.remote_dirs)
+        )
+
+        async def move(item: SyncAction) -> None:
+            source = item.source or ""
+            source_dir, _, source_name = source.rpartition("/")
+            target_dir, _, target_name = item.path.rpartition("/")
+            if item.action == SyncActionEnum.MOVE_LOCAL:
+                target = self._local_path(plan, item.path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(self._local_path(plan, source), target)
+                return
+            file_id = item.file_id or 0
+            if source_dir != target_dir:
+                await files.move([file_id], await remote_dirs.ensure(target_dir))
+            if source_name != target_name:
+                _ = await files.rename({file_id: target_name})
+
+        async def transfer(item: SyncAction) -> None:
+            local_path = self._local_path(plan, item.path)
+            if item.action == SyncActionEnum.DOWNLOAD:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                await files.download(item.file_id or 0, local_path)
+                return
+            rel_dir, _, name = item.path.rpartition("/")
+            item.file_id = await files.upload(
+                local_path=local_path,
+                remote_path=name,
+                parent_id=await remote_dirs.ensure(rel_dir),
+                do_cover=True,
+            )
+
+        async def delete_local(item: SyncAction) -> None:
+            local_path = self._local_path(plan, item.path)
+            if os.path.isdir(local_path):
+                shutil.rmtree(local_path)
+            else:
+                os.remove(local_path)
+
+        moves = (SyncActionEnum.MOVE_LOCAL, SyncActionEnum.MOVE_REMOTE)
+        transfers = (SyncActionEnum.UPLOAD, SyncActionEnum.DOWNLOAD)
+        await self._run((i for i in plan.actions if i.action in moves), move)
+        await self._run((i for i in plan.actions if i.action in transfers), transfer)
+        await remote_dirs.wait()
+        await self._run(
+            (i for i in plan.actions if i.action == SyncActionEnum.DELETE_LOCAL),
+            delete_local,
+        )
+
+        remote_deletes = [
+            item for item in plan.actions if item.action == SyncActionEnum.DELETE_REMOTE
+        ]
+        if remote_deletes:
+            try:
+                await files.trash([item.file_id or 0 for item in remote_deletes])
+            except Exception as e:
+                if not isinstance(e, BatchException):
+                    for item in remote_deletes:
+                        item.error = e
+                    return plan
+                failed = {
+                    file_id: error
+                    for batch, error in cast(BatchException[None], e).errors
+                    for file_id in batch
+                }
+                for item in remote_deletes:
+                    item.error = failed.get(item.file_id)
+        return plan
+
+    async def sync(
+        self,
+        local_dir: str,
+        remote_dir_id: int = 0,
+        mode: SyncModeEnum = SyncModeEnum.UPLOAD,
+        delete: bool = False,
+        dry_run: bool = False,
+    ) -> SyncPlan:
+        plan = await self.plan(local_dir, remote_dir_id, mode, delete)
+        if dry_run:
+            return plan
+        return await self.execute(plan)
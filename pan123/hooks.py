@@ -0,0 +1,31 @@
+__all__ = ["RequestStartEvent", "RequestEndEvent", "RequestHook"]
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class RequestStartEvent:
+    method: str
+    endpoint: str
+    base_url: str
+
+
+@dataclass(slots=True)
+class RequestEndEvent:
+    method: str
+    endpoint: str
+    base_url: str
+    status: int | None
+    bytes_sent: int
+    bytes_received: int
+    latency: float
+    trace_id: str | None
+    error: BaseException | None
+
+
+class RequestHook:
+    def on_request_start(self, event: RequestStartEvent) -> None:
+        _ = event
+
+    def on_request_end(self, event: RequestEndEvent) -> None:
+        _ = event
@@ -0,0 +1,222 @@
+__all__ = [
+    "TransferProgress",
+    "TransferPartEvent",
+    "TransferListener",
+    "Histogram",
+    "HostStats",
+    "TransferMetrics",
+    "TransferTracker",
+]
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from typing_extensions import override
+
+from .log import logger
+from .transfer import Direction
+
+LATENCY_BOUNDS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+THROUGHPUT_BOUNDS = tuple(
+    float(mib * 1024 * 1024) for mib in (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+
+@dataclass(slots=True)
+class TransferProgress:
+    direction: Direction
+    path: str
+    bytes_done: int
+    bytes_total: int
+    elapsed: float
+    rate: float
+    average_rate: float
+    retries: int
+
+    @property
+    def fraction(self) -> float:
+        return self.bytes_done / self.bytes_total if self.bytes_total else 1.0
+
+
+@dataclass(slots=True)
+class TransferPartEvent:
+    direction: Direction
+    path: str
+    host: str
+    size: int
+    latency: float
+    error: BaseException | None = None
+
+
+class TransferListener:
+    def on_progress(self, progress: TransferProgress) -> None:
+        _ = progress
+
+    def on_part(self, event: TransferPartEvent) -> None:
+        _ = event
+
+
+@dataclass(slots=True)
+class Histogram:
+    bounds: tuple[float, ...]
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    total: float = 0.0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            self.counts = [0] * (len(self.bounds) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= rank and seen:
+                return bound
+        return float("inf")
+
+    def export(self) -> dict[str, object]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "buckets": {
+                **{str(bound): c for bound, c in zip(self.bounds, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+@dataclass(slots=True)
+class HostStats:
+    latency: Histogram = field(default_factory=lambda: Histogram(LATENCY_BOUNDS))
+    throughput: Histogram = field(default_factory=lambda: Histogram(THROUGHPUT_BOUNDS))
+    bytes: int = 0
+    errors: int = 0
+
+    def export(self) -> dict[str, object]:
+        return {
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "latency": self.latency.export(),
+            "throughput": self.throughput.export(),
+        }
+
+
+class TransferMetrics(TransferListener):
+    def __init__(self):
+        self.hosts: dict[tuple[Direction, str], HostStats] = {}
+
+    @override
+    def on_part(self, event: TransferPartEvent) -> None:
+        stats = self.hosts.get((event.direction, event.host))
+        if stats is None:
+            stats = self.hosts[(event.direction, event.host)] = HostStats()
+        if event.error is not None:
+            stats.errors += 1
+            return
+        stats.bytes += event.size
+        stats.latency.observe(event.latency)
+        if event.latency > 0:
+            stats.throughput.observe(event.size / event.latency)
+
+    def export(self) -> dict[str, dict[str, dict[str, object]]]:
+        return {
+            direction: {
+                host: stats.export()
+                for (stats_direction, host), stats in self.hosts.items()
+                if stats_direction == direction
+            }
+            for direction in ("upload", "download")
+        }
+
+
+class TransferTracker:
+    def __init__(
+        self,
+        direction: Direction,
+        path: str,
+        bytes_total: int,
+        listeners: list[TransferListener],
+        interval: float = 0.1,
+        smoothing: float = 0.3,
+    ):
+        self.direction: Direction = direction
+        self.path: str = path
+        self.bytes_total: int = bytes_total
+        self.bytes_done: int = 0
+        self.retries: int = 0
+        self.rate: float = 0.0
+        self._listeners: list[TransferListener] = listeners
+        self._interval: float = interval
+        self._smoothing: float = smoothing
+        self._started: float = perf_counter()
+        self._emitted: float = self._started
+        self._emitted_bytes: int = 0
+        self._resumed_bytes: int = 0
+
+    def resume(self, size: int) -> None:
+        self.bytes_done += size
+        self._resumed_bytes += size
+        self._emitted_bytes = self.bytes_done
+
+    def advance(self, size: int) -> None:
+        self.bytes_done += size
+        now = perf_counter()
+        if now - self._emitted >= self._interval:
+            self._emit(now)
+
+    def retry(self) -> None:
+        self.retries += 1
+
+    def part(
+        self,
+        host: str,
+        size: int,
+        latency: float,
+        error: BaseException | None = None,
+    ) -> None:
+        event = TransferPartEvent(self.direction, self.path, host, size, latency, error)
+        for listener in self._listeners:
+            try:
+                listener.on_part(event)
+            except Exception:
+                logger.exception(f"{listener!r} failed on transfer part")
+
+    def finish(self) -> None:
+        self._emit(perf_counter())
+
+    def _emit(self, now: float) -> None:
+        elapsed = now - self._started
+        if now > self._emitted:
+            rate = (self.bytes_done - self._emitted_bytes) / (now - self._emitted)
+            self.rate = (
+                rate
+                if self._emitted == self._started
+                else self._smoothing * rate + (1 - self._smoothing) * self.rate
+            )
+        self._emitted = now
+        self._emitted_bytes = self.bytes_done
+        progress = TransferProgress(
+            direction=self.direction,
+            path=self.path,
+            bytes_done=self.bytes_done,
+            bytes_total=self.bytes_total,
+            elapsed=elapsed,
+            rate=self.rate,
+            average_rate=(
+                (self.bytes_done - self._resumed_bytes) / elapsed if elapsed else 0.0
+            ),
+            retries=self.retries,
+        )
+        for listener in self._listeners:
+            try:
+                listener.on_progress(progress)
+            except Exception:
+                logger.exception(f"{listener!r} failed on transfer progress")
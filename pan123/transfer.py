@@ -0,0 +1,92 @@
+__all__ = ["TransferPriority", "ByteBucket", "TransferScheduler"]
+
+from asyncio import Future, Task, create_task, get_running_loop, sleep
+from enum import IntEnum
+from heapq import heappop, heappush
+from itertools import count
+from time import monotonic
+from typing import Literal
+
+Direction = Literal["upload", "download"]
+
+
+class TransferPriority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    BULK = 2
+
+
+class ByteBucket:
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate: float = rate
+        self.burst: int = burst or max(int(rate), 1)
+        self._tokens: float = self.burst
+        self._updated: float = monotonic()
+        self._waiters: list[tuple[int, int, int, Future[None]]] = []
+        self._seq: count[int] = count()
+        self._dispatcher: Task[None] | None = None
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(
+        self, size: int, priority: TransferPriority = TransferPriority.NORMAL
+    ) -> None:
+        self._refill()
+        if not self._waiters and self._tokens >= min(size, self.burst):
+            self._tokens -= size
+            return
+        waiter: Future[None] = get_running_loop().create_future()
+        heappush(self._waiters, (priority, next(self._seq), size, waiter))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = create_task(self._dispatch())
+        await waiter
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            _, _, size, waiter = self._waiters[0]
+            if waiter.done():
+                _ = heappop(self._waiters)
+                continue
+            self._refill()
+            needed = min(size, self.burst)
+            if self._tokens >= needed:
+                _ = heappop(self._waiters)
+                self._tokens -= size
+                waiter.set_result(None)
+                continue
+            await sleep((needed - self._tokens) / self.rate)
+
+
+class TransferScheduler:
+    def __init__(
+        self,
+        rate: float | None = None,
+        upload_rate: float | None = None,
+        download_rate: float | None = None,
+        burst: int | None = None,
+    ):
+        self._buckets: dict[str, ByteBucket] = {
+            name: ByteBucket(limit, burst)
+            for name, limit in (
+                ("total", rate),
+                ("upload", upload_rate),
+                ("download", download_rate),
+            )
+            if limit is not None
+        }
+
+    async def acquire(
+        self,
+        direction: Direction,
+        size: int,
+        priority: TransferPriority = TransferPriority.NORMAL,
+    ) -> None:
+        if not self._buckets:
+            return
+        for name in (direction, "total"):
+            bucket = self._buckets.get(name)
+            if bucket is not None:
+                await bucket.acquire(size, priority)
@@ -0,0 +1,79 @@
+__all__ = ["gather_or_cancel", "FileLock"]
+
+import sys
+from asyncio import ensure_future, gather, to_thread
+from collections.abc import Awaitable
+from types import TracebackType
+from typing import IO, TypeVar
+
+T = TypeVar("T")
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock(f: IO[bytes]) -> None:
+        _ = f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock(f: IO[bytes]) -> None:
+        _ = f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock(f: IO[bytes]) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(f: IO[bytes]) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+async def gather_or_cancel(*aws: Awaitable[T]) -> list[T]:
+    tasks = [ensure_future(aw) for aw in aws]
+    try:
+        return await gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            _ = task.cancel()
+        _ = await gather(*tasks, return_exceptions=True)
+        raise
+
+
+class FileLock:
+    def __init__(self, path: str):
+        self.path: str = path
+        self._file: IO[bytes] | None = None
+
+    def acquire(self) -> None:
+        f = open(self.path, "ab")
+        try:
+            _lock(f)
+        except BaseException:
+            f.close()
+            raise
+        self._file = f
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        _unlock(self._file)
+        self._file.close()
+        self._file = None
+
+    async def __aenter__(self):
+        await to_thread(self.acquire)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[Exception] | None,
+        exc_val: Exception | None,
+        exc_tb: TracebackType | None,
+    ):
+        self.release()
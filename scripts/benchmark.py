@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+
+from httpx import AsyncClient
+from typing_extensions import override
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pan123 import Pan123
+from pan123.emulator import Emulator, EmulatorConfig
+from pan123.hooks import RequestEndEvent, RequestHook
+
+MIB = 1024 * 1024
+
+
+@dataclass(slots=True)
+class EndpointLatency:
+    count: int
+    p50: float
+    p99: float
+
+
+@dataclass(slots=True)
+class Report:
+    upload_mib_s: float
+    download_mib_s: float
+    failed_uploads: int
+    failed_downloads: int
+    walk_entries_s: float
+    lean_walk_entries_s: float
+    api_latency_ms: dict[str, EndpointLatency]
+    api_errors: int
+    loop_lag_p99_ms: float
+    loop_lag_max_ms: float
+    peak_rss_mib: float | None
+
+
+class Args(argparse.Namespace):
+    files: int = 4
+    size: int = 32
+    slice_size: int = 4
+    concurrency: int = 4
+    latency: float = 20.0
+    jitter: float = 5.0
+    bandwidth: float = 0.0
+    link_bandwidth: float = 0.0
+    fault_rate: float = 0.0
+    tree_dirs: int = 20
+    tree_files: int = 500
+    seed: int = 0
+    json: bool = False
+
+
+class LatencyHook(RequestHook):
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: int = 0
+
+    @override
+    def on_request_end(self, event: RequestEndEvent) -> None:
+        self.latencies.setdefault(event.endpoint, []).append(event.latency)
+        if event.error is not None:
+            self.errors += 1
+
+
+class LoopLag:
+    def __init__(self, interval: float = 0.01):
+        self.interval: float = interval
+        self.lags: list[float] = []
+        self._task: asyncio.Task[None] | None = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - started - self.interval, 0))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            _ = self._task.cancel()
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def peak_rss_mib() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MIB if sys.platform == "darwin" else peak / 1024
+
+
+async def timed(run: Callable[[], Awaitable[None]]) -> float:
+    started = time.perf_counter()
+    await run()
+    return time.perf_counter() - started
+
+
+async def run(args: Args) -> Report:
+    emulator = Emulator(
+        EmulatorConfig(
+            latency=args.latency / 1000,
+            jitter=args.jitter / 1000,
+            bandwidth=args.bandwidth * MIB if args.bandwidth else None,
+            link_bandwidth=args.link_bandwidth * MIB if args.link_bandwidth else None,
+            faults={
+                "/upload/v2/file/slice": args.fault_rate,
+                "download": args.fault_rate,
+            },
+            slice_size=args.slice_size * MIB,
+            seed=args.seed,
+        )
+    )
+    rng = random.Random(args.seed)
+    tree_root = emulator.add_dir("tree")
+    for dir_no in range(args.tree_dirs):
+        dir_id = emulator.add_dir(f"d{dir_no}", tree_root)
+        for file_no in range(args.tree_files):
+            _ = emulator.add_file(f"f{file_no}", b"", dir_id)
+
+    hook = LatencyHook()
+    lag = LoopLag()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            local_paths: list[str] = []
+            for file_no in range(args.files):
+                local_path = os.path.join(workdir, f"upload{file_no}.bin")
+                with open(local_path, "wb") as f:
+                    _ = f.write(rng.randbytes(args.size * MIB))
+                local_paths.append(local_path)
+
+            async with (
+                AsyncClient(transport=emulator) as http,
+                Pan123(
+                    client_id="benchmark",
+                    client_secret="benchmark",
+                    client=http,
+                    upload_concurrency=args.concurrency,
+                    download_connections=args.concurrency,
+                    hooks=[hook],
+                ) as pan,
+            ):
+                lag.start()
+                uploaded: list[tuple[int, str]] = []
+                failures: dict[str, int] = {"upload": 0, "download": 0}
+
+                async def upload_all() -> None:
+                    results = await asyncio.gather(
+                        *(
+                            pan.files.upload(path, os.path.basename(path))
+                            for path in local_paths
+                        ),
+                        return_exceptions=True,
+                    )
+                    for path, result in zip(local_paths, results):
+                        if isinstance(result, BaseException):
+                            print(
+                                f"upload of {path} failed: {result!r}", file=sys.stderr
+                            )
+                            failures["upload"] += 1
+                        else:
+                            uploaded.append((result, path))
+
+                async def download_all() -> None:
+                    results = await asyncio.gather(
+                        *(
+                            pan.files.download(file_id, f"{path}.out")
+                            for file_id, path in uploaded
+                        ),
+                        return_exceptions=True,
+                    )
+                    for (_, path), result in zip(uploaded, results):
+                        if isinstance(result, BaseException):
+                            print(
+                                f"download of {path} failed: {result!r}",
+                                file=sys.stderr,
+                            )
+                            failures["download"] += 1
+
+                async def walk(lean: bool) -> None:
+                    async for _ in pan.files.walk(tree_root, lean=lean):
+                        pass
+
+                upload_time = await timed(upload_all)
+                download_time = await timed(download_all)
+                walk_time = await timed(lambda: walk(False))
+                lean_walk_time = await timed(lambda: walk(True))
+                lag.stop()
+
+            walked = args.tree_dirs * (args.tree_files + 1)
+            uploaded_bytes = (args.files - failures["upload"]) * args.size * MIB
+            downloaded_bytes = (len(uploaded) - failures["download"]) * args.size * MIB
+            return Report(
+                upload_mib_s=uploaded_bytes / MIB / upload_time,
+                download_mib_s=downloaded_bytes / MIB / download_time,
+                failed_uploads=failures["upload"],
+                failed_downloads=failures["download"],
+                walk_entries_s=walked / walk_time,
+                lean_walk_entries_s=walked / lean_walk_time,
+                api_latency_ms={
+                    endpoint: EndpointLatency(
+                        count=len(latencies),
+                        p50=percentile(latencies, 0.5) * 1000,
+                        p99=percentile(latencies, 0.99) * 1000,
+                    )
+                    for endpoint, latencies in sorted(hook.latencies.items())
+                },
+                api_errors=hook.errors,
+                loop_lag_p99_ms=percentile(lag.lags, 0.99) * 1000,
+                loop_lag_max_ms=max(lag.lags, default=0) * 1000,
+                peak_rss_mib=peak_rss_mib(),
+            )
+        finally:
+            os.chdir(cwd)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark pan123 against the in-process API emulator"
+    )
+    _ = parser.add_argument("--files", type=int)
+    _ = parser.add_argument("--size", type=int, help="MiB per file")
+    _ = parser.add_argument("--slice-size", type=int, help="MiB")
+    _ = parser.add_argument("--concurrency", type=int)
+    _ = parser.add_argument("--latency", type=float, help="ms")
+    _ = parser.add_argument("--jitter", type=float, help="ms")
+    _ = parser.add_argument("--bandwidth", type=float, help="MiB/s")
+    _ = parser.add_argument("--link-bandwidth", type=float, help="MiB/s")
+    _ = parser.add_argument("--fault-rate", type=float)
+    _ = parser.add_argument("--tree-dirs", type=int)
+    _ = parser.add_argument("--tree-files", type=int)
+    _ = parser.add_argument("--seed", type=int)
+    _ = parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(namespace=Args())
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(asdict(report), indent=2))
+        return
+    print(f"upload       {report.upload_mib_s:10.1f} MiB/s")
+    print(f"download     {report.download_mib_s:10.1f} MiB/s")
+    print(f"walk         {report.walk_entries_s:10.0f} entries/s")
+    print(f"lean walk    {report.lean_walk_entries_s:10.0f} entries/s")
+    for endpoint, stats in report.api_latency_ms.items():
+        print(
+            f"{endpoint:40} n={stats.count:<6} "
+            + f"p50={stats.p50:7.1f}ms p99={stats.p99:7.1f}ms"
+        )
+    print(f"api errors   {report.api_errors:10d}")
+    print(
+        f"failed       upload={report.failed_uploads} "
+        + f"download={report.failed_downloads}"
+    )
+    print(
+        f"loop lag     p99={report.loop_lag_p99_ms:.1f}ms "
+        + f"max={report.loop_lag_max_ms:.1f}ms"
+    )
+    if report.peak_rss_mib is not None:
+        print(f"peak RSS     {report.peak_rss_mib:10.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
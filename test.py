@@ -4,6 +4,7 @@
 # https://opensource.org/licenses/MIT
 
 import pan123
+import os
 import json
 import typing
 import logging
@@ -56,6 +57,19 @@ async def test_upload(client: pan123.Pan123):
     print(fileid)
 
 
+async def test_upload_tree(client: pan123.Pan123):
+    dirname = "".join(random.choices(RANDOM_POOL, k=8))
+    os.makedirs(f"{dirname}/sub")
+    for path in (dirname, f"{dirname}/sub"):
+        os.rename(summon_random_file(), f"{path}/{random.randint(0, 9999)}.bin")
+    results = await client.files.upload_tree(
+        local_dir=dirname,
+        remote_parent_id=0,
+    )
+    for result in results:
+        print(result)
+
+
 async def test_rename(client: pan123.Pan123):
     rename = await client.files.rename(
         files={
@@ -124,6 +138,29 @@ async def test_search(client: pan123.Pan123):
     print(search.model_dump_json(indent=2))
 
 
+async def test_iter_list(client: pan123.Pan123):
+    async for info in client.files.iter_list(dir_id=0, prefetch=2):
+        print(info.model_dump_json())
+
+
+async def test_walk(client: pan123.Pan123):
+    async for path, info in client.files.walk(root_id=0, skip_trashed=True):
+        print(path, info.fileId)
+
+
+async def test_resolve(client: pan123.Pan123):
+    print(await client.files.resolve("/test2"))
+    print((await client.files.stat("/test2")).model_dump_json(indent=2))
+
+
+async def test_sync(client: pan123.Pan123):
+    engine = pan123.file.sync.SyncEngine(client.files)
+    plan = await engine.sync(".", 0, dry_run=True)
+    engine.close()
+    for action in plan.actions:
+        print(action.action.name, action.path, action.source)
+
+
 async def test_move(client: pan123.Pan123):
     move = await client.files.move(
         file_ids=[32521375],
@@ -135,6 +172,11 @@ async def test_download(client: pan123.Pan123):
     download = await client.files.download(file_id=32308613, local_path="test.bin")
 
 
+async def test_download_tree(client: pan123.Pan123):
+    for result in await client.files.download_tree(0, "test_download"):
+        print(result.remote_path, result.ok)
+
+
 async def main():
     async with pan123.Pan123(
         client_id=client_id, client_secret=client_secret
@@ -142,6 +184,7 @@ async def main():
         # await test_userinfo(client)
         # await test_mkdir(client)
         # await test_upload(client)
+        # await test_upload_tree(client)
         # await test_rename(client)
         # await test_trash(client)
         # await test_copy(client)
@@ -149,8 +192,13 @@ async def main():
         # await test_reover_by_path(client)
         # await test_infos(client)
         # await test_search(client)
+        # await test_iter_list(client)
+        # await test_walk(client)
+        # await test_resolve(client)
+        # await test_sync(client)
         # await test_move(client)
         await test_download(client)
+        # await test_download_tree(client)
 
 
 if __name__ == "__main__":